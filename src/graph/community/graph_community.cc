@@ -25,6 +25,8 @@
 
 #include "graph_community.hh"
 
+#include "numpy_bind.hh"
+
 using namespace std;
 using namespace boost;
 
@@ -35,7 +37,8 @@ void community_structure(GraphInterface& g, double gamma, string corr_name,
                          size_t n_iter, double Tmin, double Tmax, size_t Nspins,
                          bool new_spins, size_t seed, bool verbose,
                          string history_file, boost::any weight,
-                         boost::any property)
+                         boost::any property, size_t patience,
+                         size_t eval_every)
 {
     typedef property_map_types::apply<mpl::vector<int32_t,int64_t>,
                                       GraphInterface::vertex_index_map_t,
@@ -65,8 +68,10 @@ void community_structure(GraphInterface& g, double gamma, string corr_name,
     else
         throw ValueException("invalid correlation type: " + corr_name);
 
+    GILRelease gil_release;
     run_action<graph_tool::detail::never_directed>()
-        (g, bind<void>(get_communities_selector(corr, g.GetVertexIndex()),
+        (g, bind<void>(get_communities_selector(corr, g.GetVertexIndex(),
+                                                patience, eval_every),
                        _1, _2, _3, gamma, n_iter,
                        make_pair(Tmin, Tmax), Nspins,
                        seed, make_pair(verbose,history_file)),
@@ -79,6 +84,27 @@ double modularity(GraphInterface& g, boost::any weight, boost::any property)
 {
     double modularity = 0;
 
+    typedef ConstantPropertyMap<int32_t,GraphInterface::edge_t> weight_map_t;
+    typedef mpl::push_back<edge_scalar_properties, weight_map_t>::type
+        edge_props_t;
+
+    if(weight.empty())
+        weight = weight_map_t(1);
+
+    run_action<graph_tool::detail::never_reversed>()
+        (g, bind<void>(get_modularity(), _1, g.GetVertexIndex(), _2, _3,
+                       ref(modularity)),
+         edge_props_t(), vertex_properties())
+        (weight, property);
+    return modularity;
+}
+
+python::object modularity_degrees(GraphInterface& g, boost::any weight)
+{
+    vector<double> k;
+    size_t E = 0;
+    double W = 0;
+
     typedef ConstantPropertyMap<int32_t,GraphInterface::edge_t> weight_map_t;
     typedef mpl::push_back<edge_scalar_properties, weight_map_t>::type
         edge_props_t;
@@ -87,12 +113,60 @@ double modularity(GraphInterface& g, boost::any weight, boost::any property)
         weight = weight_map_t(1);
 
     run_action<graph_tool::detail::never_directed>()
-        (g, bind<void>(get_modularity(), _1, _2, _3, ref(modularity)),
+        (g, bind<void>(get_modularity_degrees(), _1, g.GetVertexIndex(), _2,
+                       ref(k), ref(E), ref(W)),
+         edge_props_t())(weight);
+    return python::make_tuple(wrap_vector_owned(k), E, W);
+}
+
+double modularity_cached(GraphInterface& g, boost::any weight,
+                         boost::any property, python::object k, size_t E,
+                         double W)
+{
+    double modularity = 0;
+
+    typedef ConstantPropertyMap<int32_t,GraphInterface::edge_t> weight_map_t;
+    typedef mpl::push_back<edge_scalar_properties, weight_map_t>::type
+        edge_props_t;
+
+    if(weight.empty())
+        weight = weight_map_t(1);
+
+    multi_array_ref<double,1> k_array = get_array<double,1>(k);
+    if (k_array.shape()[0] < num_vertices(g.GetGraph()))
+        throw ValueException("invalid degree array size");
+
+    run_action<graph_tool::detail::never_directed>()
+        (g, bind<void>(get_modularity_cached(), _1, g.GetVertexIndex(), _2, _3,
+                       k_array, E, W, ref(modularity)),
          edge_props_t(), vertex_properties())
         (weight, property);
     return modularity;
 }
 
+python::object modularity_batch(GraphInterface& g, boost::any weight,
+                                python::object partitions)
+{
+    vector<double> modularity;
+
+    typedef ConstantPropertyMap<int32_t,GraphInterface::edge_t> weight_map_t;
+    typedef mpl::push_back<edge_scalar_properties, weight_map_t>::type
+        edge_props_t;
+
+    if(weight.empty())
+        weight = weight_map_t(1);
+
+    multi_array_ref<int64_t,2> parts = get_array<int64_t,2>(partitions);
+    if (parts.shape()[0] < num_vertices(g.GetGraph()))
+        throw ValueException("invalid partition array size");
+
+    run_action<graph_tool::detail::never_directed>()
+        (g, bind<void>(get_modularity_batch(), _1, g.GetVertexIndex(), _2,
+                       parts, ref(modularity)),
+         edge_props_t())(weight);
+    return wrap_vector_owned(modularity);
+}
+
 using namespace boost::python;
 
 
@@ -102,9 +176,17 @@ extern void community_network(GraphInterface& gi, GraphInterface& cgi,
                               boost::any vertex_count,
                               boost::any edge_count, boost::any weight);
 
+extern void louvain(GraphInterface& g, double gamma, string corr_name,
+                    size_t max_iter, size_t seed, bool verbose,
+                    boost::any weight, boost::any property);
+
 BOOST_PYTHON_MODULE(libgraph_tool_community)
 {
     def("community_structure", &community_structure);
     def("modularity", &modularity);
+    def("modularity_degrees", &modularity_degrees);
+    def("modularity_cached", &modularity_cached);
+    def("modularity_batch", &modularity_batch);
     def("community_network", &community_network);
+    def("louvain", &louvain);
 }
@@ -33,10 +33,15 @@
 
 #define BOOST_DISABLE_ASSERTS
 #include "boost/multi_array.hpp"
+#include <boost/type_traits/is_integral.hpp>
 
 #include "graph_util.hh"
 #include "graph_properties.hh"
 
+#ifdef USING_OPENMP
+#include <omp.h>
+#endif
+
 namespace graph_tool
 {
 
@@ -48,6 +53,235 @@ using std::tr1::unordered_set;
 
 typedef tr1::mt19937 rng_t;
 
+// assigns to each vertex a community label in the range [0, C-1], stored in
+// `label` at its vertex index, and returns C. If the community values are integers in the
+// range [0, N-1], as is the case if they were previously compacted, the labels
+// are found with a flat array, otherwise a hash table is used.
+template <class Graph, class VertexIndex, class CommunityMap>
+size_t get_community_labels(const Graph& g, VertexIndex vertex_index,
+                            CommunityMap s, vector<size_t>& label,
+                            mpl::false_)
+{
+    typedef typename property_traits<CommunityMap>::value_type s_val_t;
+    label.resize(num_vertices(g));
+    unordered_map<s_val_t, size_t> comms;
+    typename graph_traits<Graph>::vertex_iterator v, v_end;
+    for (tie(v,v_end) = vertices(g); v != v_end; ++v)
+    {
+        typeof(comms.begin()) iter = comms.find(get(s, *v));
+        if (iter == comms.end())
+            iter = comms.insert(make_pair(get(s, *v), comms.size())).first;
+        label[vertex_index[*v]] = iter->second;
+    }
+    return comms.size();
+}
+
+template <class Graph, class VertexIndex, class CommunityMap>
+size_t get_community_labels(const Graph& g, VertexIndex vertex_index,
+                            CommunityMap s, vector<size_t>& label,
+                            mpl::true_)
+{
+    typedef typename property_traits<CommunityMap>::value_type s_val_t;
+    size_t N = num_vertices(g);
+    typename graph_traits<Graph>::vertex_iterator v, v_end;
+    for (tie(v,v_end) = vertices(g); v != v_end; ++v)
+    {
+        s_val_t r = get(s, *v);
+        if (r < s_val_t(0) || size_t(r) >= N)
+            return get_community_labels(g, vertex_index, s, label,
+                                        mpl::false_());
+    }
+
+    label.resize(N);
+    vector<size_t> comms(N, numeric_limits<size_t>::max());
+    size_t C = 0;
+    for (tie(v,v_end) = vertices(g); v != v_end; ++v)
+    {
+        size_t& l = comms[size_t(get(s, *v))];
+        if (l == numeric_limits<size_t>::max())
+            l = C++;
+        label[vertex_index[*v]] = l;
+    }
+    return C;
+}
+
+template <class Graph, class VertexIndex, class CommunityMap>
+size_t get_community_labels(const Graph& g, VertexIndex vertex_index,
+                            CommunityMap s, vector<size_t>& label)
+{
+    typedef typename property_traits<CommunityMap>::value_type s_val_t;
+    return get_community_labels(g, vertex_index, s, label,
+                                typename is_integral<s_val_t>::type());
+}
+
+// get Newman's modularity of a given community partition
+struct get_modularity
+{
+    template <class Graph, class VertexIndex, class WeightMap,
+              class CommunityMap>
+    void operator()(const Graph& g, VertexIndex vertex_index, WeightMap weights,
+                    CommunityMap s, double& modularity) const
+    {
+        typedef typename property_traits<WeightMap>::key_type weight_key_t;
+
+        modularity = 0.0;
+        size_t E = 0;
+        double W = 0;
+
+        vector<size_t> label;
+        size_t C = get_community_labels(g, vertex_index, s, label);
+        vector<size_t> Ks(C, 0);
+
+        // the community degrees are accumulated in the same pass over the
+        // edges, with both endpoints of each edge, so that directed graphs are
+        // treated as undirected without the need of an undirected view
+        typename graph_traits<Graph>::edge_iterator e, e_end;
+        for (tie(e,e_end) = edges(g); e != e_end; ++e)
+        {
+            size_t r = label[vertex_index[source(*e,g)]];
+            size_t t = label[vertex_index[target(*e,g)]];
+            if (target(*e,g) != source(*e,g))
+            {
+                W += get(weights, weight_key_t(*e));
+                E++;
+                Ks[r]++;
+                Ks[t]++;
+                if (r == t)
+                    modularity += 2 * get(weights, weight_key_t(*e));
+            }
+        }
+
+        for (size_t r = 0; r < C; ++r)
+            modularity -= (Ks[r]*Ks[r])/double(2*E);
+
+        modularity /= 2*W;
+    }
+};
+
+// Newman's modularity of a partition of a graph in CSR layout, where each edge
+// appears in both directions, and self-loops are omitted. This gives the same
+// result as get_modularity() above.
+inline double csr_modularity(const vector<size_t>& row,
+                             const vector<size_t>& nbr,
+                             const vector<double>& w,
+                             const vector<size_t>& spins, size_t n_spins)
+{
+    double modularity = 0, W = 0;
+    vector<size_t> Ks(n_spins, 0);
+    for (size_t i = 0; i + 1 < row.size(); ++i)
+    {
+        size_t s = spins[i];
+        Ks[s] += row[i + 1] - row[i];
+        for (size_t j = row[i]; j < row[i + 1]; ++j)
+        {
+            W += w[j];
+            if (spins[nbr[j]] == s)
+                modularity += w[j];
+        }
+    }
+    double E = nbr.size() / 2;
+    W /= 2;
+
+    for (size_t s = 0; s < Ks.size(); ++s)
+        modularity -= (Ks[s]*double(Ks[s]))/(2*E);
+    return modularity / (2*W);
+}
+
+// weight of the CSR entry j; for unweighted graphs the weight array is never
+// read
+inline double csr_weight(const vector<double>& w, size_t j, mpl::true_)
+{
+    return w[j];
+}
+
+inline double csr_weight(const vector<double>& w, size_t j, mpl::false_)
+{
+    return 1.;
+}
+
+// sums of the weights of the CSR entries in [begin, end) which point to
+// vertices with spins s1 and s2. The loop is unrolled with independent
+// accumulators and without branches, which allows it to be pipelined (and
+// vectorized) by the compiler, which is relevant for high-degree vertices.
+// The Weighted tag (mpl::true_ or mpl::false_) selects at compile time
+// whether the weights are used, or just the number of entries.
+template <class Weighted>
+inline void neighbour_spin_weights(size_t begin, size_t end,
+                                   const vector<size_t>& nbr,
+                                   const vector<double>& w,
+                                   const vector<size_t>& spins,
+                                   size_t s1, size_t s2,
+                                   double& ns1, double& ns2, Weighted)
+{
+    double a1[4] = {0, 0, 0, 0}, a2[4] = {0, 0, 0, 0};
+    size_t j = begin;
+    for (; j + 4 <= end; j += 4)
+    {
+        for (size_t l = 0; l < 4; ++l)
+        {
+            size_t t_s = spins[nbr[j + l]];
+            double x = csr_weight(w, j + l, Weighted());
+            a1[l] += (t_s == s1) ? x : 0.;
+            a2[l] += (t_s == s2) ? x : 0.;
+        }
+    }
+    for (; j < end; ++j)
+    {
+        size_t t_s = spins[nbr[j]];
+        double x = csr_weight(w, j, Weighted());
+        a1[0] += (t_s == s1) ? x : 0.;
+        a2[0] += (t_s == s2) ? x : 0.;
+    }
+    ns1 = (a1[0] + a1[1]) + (a1[2] + a1[3]);
+    ns2 = (a2[0] + a2[1]) + (a2[2] + a2[3]);
+}
+
+// greedy coloring of the active vertices of a graph in CSR layout, such that
+// no two adjacent vertices have the same color. The vertices are returned
+// grouped by color, in the range [color_ptr[c], color_ptr[c+1]) of
+// color_vertices.
+inline void csr_vertex_coloring(const vector<size_t>& row,
+                                const vector<size_t>& nbr,
+                                const vector<uint8_t>& active,
+                                vector<size_t>& color_ptr,
+                                vector<size_t>& color_vertices)
+{
+    size_t N = active.size();
+    size_t no_color = numeric_limits<size_t>::max();
+    vector<size_t> color(N, no_color);
+    vector<size_t> mark; // mark[c] == i if color c is used by a neighbour of i
+    for (size_t i = 0; i < N; ++i)
+    {
+        if (!active[i])
+            continue;
+        for (size_t j = row[i]; j < row[i + 1]; ++j)
+        {
+            size_t c = color[nbr[j]];
+            if (c != no_color)
+                mark[c] = i;
+        }
+        size_t c = 0;
+        while (c < mark.size() && mark[c] == i)
+            ++c;
+        if (c == mark.size())
+            mark.push_back(no_color);
+        color[i] = c;
+    }
+
+    color_ptr.clear();
+    color_ptr.resize(mark.size() + 1, 0);
+    for (size_t i = 0; i < N; ++i)
+        if (color[i] != no_color)
+            color_ptr[color[i] + 1]++;
+    for (size_t c = 0; c < mark.size(); ++c)
+        color_ptr[c + 1] += color_ptr[c];
+    color_vertices.resize(color_ptr.back());
+    vector<size_t> pos(color_ptr.begin(), color_ptr.end() - 1);
+    for (size_t i = 0; i < N; ++i)
+        if (color[i] != no_color)
+            color_vertices[pos[color[i]]++] = i;
+}
+
 // computes the community structure through a spin glass system with
 // simulated annealing
 
@@ -59,16 +293,20 @@ struct get_communities
     void operator()(const Graph& g, VertexIndex vertex_index, WeightMap weights,
                     CommunityMap s, double gamma, size_t n_iter, pair<double,
                     double> Tinterval, size_t n_spins, size_t seed, pair<bool,
-                    string> verbose) const
+                    string> verbose, pair<size_t, size_t> stop) const
     {
         typedef typename graph_traits<Graph>::vertex_descriptor vertex_t;
         typedef typename graph_traits<Graph>::edge_descriptor edge_t;
         typedef typename property_traits<WeightMap>::key_type weight_key_t;
 
-        rng_t rng(static_cast<rng_t::result_type>(seed));
+        // the spin-glass energy differences are specialized at compile time
+        // for unweighted graphs, as is done with the correlation type (NNKS)
+        typedef typename mpl::not_<
+            typename is_same<WeightMap,
+                             ConstantPropertyMap<double, weight_key_t> >::type
+            >::type weighted_t;
 
-        tr1::variate_generator<rng_t&, tr1::uniform_real<> >
-            random(rng, tr1::uniform_real<>());
+        rng_t rng(static_cast<rng_t::result_type>(seed));
 
         stringstream out_str;
         ofstream out_file;
@@ -85,99 +323,153 @@ struct get_communities
         double Tmin = Tinterval.first;
         double Tmax = Tinterval.second;
 
-        unordered_map<size_t, size_t> Ns; // spin histogram
-        CommunityMap temp_s(vertex_index, num_vertices(g));
+        // the graph is copied to a flat (CSR) layout, indexed by vertex index,
+        // together with the weights and the (loopless) degrees, so that the
+        // main loop only performs sequential scans over contiguous arrays,
+        // instead of going through the adjacency lists and property maps
+        size_t N = num_vertices(g);
+        vector<uint8_t> active(N, false);
+        vector<size_t> row(N + 1, 0);
+        vector<size_t> nbr;
+        vector<double> w;
+        typename graph_traits<Graph>::vertex_iterator v,v_end;
+        for (size_t i = 0; i < N; ++i)
+        {
+            vertex_t u = vertex(i, g);
+            if (u != graph_traits<Graph>::null_vertex())
+            {
+                active[i] = true;
+                typename graph_traits<Graph>::out_edge_iterator e, e_end;
+                for (tie(e,e_end) = out_edges(u,g); e != e_end; ++e)
+                {
+                    vertex_t t = target(*e, g);
+                    if (t == u)
+                        continue;
+                    nbr.push_back(vertex_index[t]);
+                    w.push_back(get(weights, weight_key_t(*e)));
+                }
+            }
+            row[i + 1] = nbr.size();
+        }
+
+        vector<size_t> spins(N, 0);
+        vector<size_t> Ns(n_spins, 0); // spin histogram
 
         // init spins from [0,N-1] and global info
         tr1::uniform_int<size_t> sample_spin(0, n_spins-1);
-        typename graph_traits<Graph>::vertex_iterator v,v_end;
         for (tie(v,v_end) = vertices(g); v != v_end; ++v)
         {
-            s[*v] = temp_s[*v] = sample_spin(rng);
-            Ns[s[*v]]++;
+            size_t i = vertex_index[*v];
+            s[*v] = spins[i] = sample_spin(rng);
+            Ns[spins[i]]++;
         }
 
         NNKS<Graph,CommunityMap> Nnnks(g, s); // this will retrieve the expected
                                               // number of neighbours with given
                                               // spin, as a function of degree
 
+        // the vertices are greedily colored, so that no two adjacent vertices
+        // have the same color. The vertices of the same color can then be
+        // updated in parallel, since their energy differences do not depend on
+        // each other
+        vector<size_t> color_ptr, color_vertices;
+        csr_vertex_coloring(row, nbr, active, color_ptr, color_vertices);
+        size_t n_colors = color_ptr.size() - 1;
+
+        // each thread has its own RNG, seeded from the main one
+        size_t n_threads = 1;
+        #ifdef USING_OPENMP
+        n_threads = omp_get_max_threads();
+        #endif
+        vector<rng_t> rngs;
+        for (size_t j = 0; j < n_threads; ++j)
+            rngs.push_back(rng_t(static_cast<rng_t::result_type>(rng())));
+        vector<vector<tr1::tuple<size_t, size_t, size_t> > >
+            updates(n_threads);
+
         // define cooling rate so that temperature starts at Tmax at temp_count
         // == 0 and reaches Tmin at temp_count == n_iter - 1
         if (Tmin < numeric_limits<double>::epsilon())
             Tmin = numeric_limits<double>::epsilon();
         double cooling_rate = -(log(Tmin)-log(Tmax))/(n_iter-1);
 
+        // if stop.first (the "patience") is nonzero, the modularity is
+        // computed every stop.second iterations, and the annealing stops if it
+        // does not improve after stop.first consecutive evaluations; the best
+        // partition found is kept in best_spins
+        size_t patience = stop.first;
+        size_t eval_every = max(stop.second, size_t(1));
+        double best_Q = 0;
+        bool found_best = false;
+        size_t n_stall = 0;
+        vector<size_t> best_spins;
+
         // start the annealing
         for (size_t temp_count = 0; temp_count < n_iter; ++temp_count)
         {
             double T = Tmax*exp(-cooling_rate*temp_count);
             double E = 0;
 
-            vector<tr1::tuple<size_t, size_t, size_t> > updates;
-
-            // sample a new spin for every vertex
-            int NV = num_vertices(g),i;
-            #pragma omp parallel for default(shared) private(i)\
-                reduction(+:E) schedule(dynamic)
-            for (i = 0; i < NV; ++i)
+            // sample a new spin for every vertex, one color at a time
+            for (size_t c = 0; c < n_colors; ++c)
             {
-                vertex_t v = vertex(i, g);
-                if (v == graph_traits<Graph>::null_vertex())
-                    continue;
-
-                size_t new_s;
+                int NC = color_ptr[c + 1], i;
+                #pragma omp parallel for default(shared) private(i)\
+                    reduction(+:E) schedule(dynamic, 256)
+                for (i = color_ptr[c]; i < NC; ++i)
                 {
-                    #pragma omp critical
-                    new_s = sample_spin(rng);
-                }
-
-                unordered_map<size_t, double> ns; // number of neighbours with a
-                                                  // given spin 's' (weighted)
-
-                // neighborhood spins info
-                typename graph_traits<Graph>::out_edge_iterator e, e_end;
-                for (tie(e,e_end) = out_edges(v,g); e != e_end; ++e)
-                {
-                    vertex_t t = target(*e, g);
-                    if (t != v)
-                        ns[s[t]] += get(weights, weight_key_t(*e));
-                }
-
-                size_t k = out_degree_no_loops(v, g);
-
-                double curr_e = gamma*Nnnks(k,s[v]) - ns[s[v]];
-                double new_e = gamma*Nnnks(k,new_s) - ns[new_s];
-
-                double r;
-                {
-                    #pragma omp critical
-                    r = random();
+                    size_t u = color_vertices[i];
+                    size_t tid = 0;
+                    #ifdef USING_OPENMP
+                    tid = omp_get_thread_num();
+                    #endif
+                    rng_t& trng = rngs[tid];
+
+                    tr1::uniform_int<size_t> sample(0, n_spins-1);
+                    size_t new_s = sample(trng);
+
+                    // number of neighbours with the current and the new spin
+                    // (weighted); only these two are needed to compute the
+                    // energy difference, so there is no need to tally all the
+                    // neighbour spins
+                    size_t curr_s = spins[u];
+                    double ns_curr, ns_new;
+                    neighbour_spin_weights(row[u], row[u + 1], nbr, w, spins,
+                                           curr_s, new_s, ns_curr, ns_new,
+                                           weighted_t());
+
+                    size_t k = row[u + 1] - row[u];
+
+                    double curr_e = gamma*Nnnks(k,curr_s) - ns_curr;
+                    double new_e = gamma*Nnnks(k,new_s) - ns_new;
+
+                    tr1::variate_generator<rng_t&, tr1::uniform_real<> >
+                        random(trng, tr1::uniform_real<>());
+                    if (new_e < curr_e || random() < exp(-(new_e - curr_e)/T))
+                    {
+                        // no neighbour has the same color, so this can be
+                        // done in place
+                        spins[u] = new_s;
+                        curr_e = new_e;
+                        updates[tid].push_back(tr1::make_tuple(k, curr_s,
+                                                               new_s));
+                    }
+                    E += curr_e;
                 }
 
-                if (new_e < curr_e || r < exp(-(new_e - curr_e)/T))
+                for (size_t j = 0; j < updates.size(); ++j)
                 {
-                    temp_s[v] = new_s;
-                    curr_e = new_e;
+                    for (typeof(updates[j].begin()) iter = updates[j].begin();
+                         iter != updates[j].end(); ++iter)
                     {
-                        #pragma omp critical
-                        updates.push_back(tr1::make_tuple(k, size_t(s[v]),
-                                                          new_s));
-                        Ns[s[v]]--;
-                        Ns[new_s]++;
+                        Nnnks.Update(tr1::get<0>(*iter), tr1::get<1>(*iter),
+                                     tr1::get<2>(*iter));
+                        Ns[tr1::get<1>(*iter)]--;
+                        Ns[tr1::get<2>(*iter)]++;
                     }
+                    updates[j].clear();
                 }
-                else
-                {
-                    temp_s[v] = s[v];
-                }
-                E += curr_e;
             }
-            swap(s, temp_s);
-
-            for (typeof(updates.begin()) iter = updates.begin();
-                 iter != updates.end(); ++iter)
-                Nnnks.Update(tr1::get<0>(*iter), tr1::get<1>(*iter),
-                             tr1::get<2>(*iter));
 
             if (verbose.first)
             {
@@ -185,9 +477,8 @@ struct get_communities
                     cout << "\b";
                 out_str.str("");
                 size_t ns = 0;
-                for (typeof(Ns.begin()) iter = Ns.begin(); iter != Ns.end();
-                     ++iter)
-                    if (iter->second > 0)
+                for (size_t r = 0; r < Ns.size(); ++r)
+                    if (Ns[r] > 0)
                         ns++;
                 out_str << setw(lexical_cast<string>(n_iter).size())
                         << temp_count << " of " << n_iter
@@ -202,9 +493,8 @@ struct get_communities
                 try
                 {
                     size_t ns = 0;
-                    for (typeof(Ns.begin()) iter = Ns.begin(); iter != Ns.end();
-                         ++iter)
-                        if (iter->second > 0)
+                    for (size_t r = 0; r < Ns.size(); ++r)
+                        if (Ns[r] > 0)
                             ns++;
                     out_file << temp_count << "\t" << setprecision(10) << T
                              << "\t" << ns << "\t" << E << endl;
@@ -215,29 +505,37 @@ struct get_communities
                                       verbose.second + ": " + e.what());
                 }
             }
-        }
 
-        if (n_iter % 2 != 0)
-        {
-            int NV = num_vertices(g), i;
-            #pragma omp parallel for default(shared) private(i)\
-                schedule(dynamic)
-            for (i = 0; i < NV; ++i)
+            if (patience > 0 && ((temp_count + 1) % eval_every == 0 ||
+                                 temp_count + 1 == n_iter))
             {
-                vertex_t v = vertex(i, g);
-                if (v == graph_traits<Graph>::null_vertex())
-                    continue;
-                temp_s[v] = s[v];
+                double Q = csr_modularity(row, nbr, w, spins, n_spins);
+                if (!found_best || Q > best_Q)
+                {
+                    best_Q = Q;
+                    found_best = true;
+                    n_stall = 0;
+                    best_spins = spins;
+                }
+                else if (++n_stall >= patience)
+                {
+                    break;
+                }
             }
         }
 
+        if (found_best)
+            spins.swap(best_spins);
+        for (tie(v,v_end) = vertices(g); v != v_end; ++v)
+            s[*v] = spins[vertex_index[*v]];
+
         // rename spins, starting from zero
-        unordered_map<size_t,size_t> spins;
+        unordered_map<size_t,size_t> labels;
         for (tie(v,v_end) = vertices(g); v != v_end; ++v)
         {
-            if (spins.find(s[*v]) == spins.end())
-                spins[s[*v]] = spins.size() - 1;
-            s[*v] = spins[s[*v]];
+            if (labels.find(s[*v]) == labels.end())
+                labels[s[*v]] = labels.size() - 1;
+            s[*v] = labels[s[*v]];
         }
 
     }
@@ -257,7 +555,10 @@ public:
             size_t k = out_degree_no_loops(*v,g);
             _avg_k += k;
             N++;
-            _Ns[s[*v]]++;
+            size_t r = s[*v];
+            if (r >= _Ns.size())
+                _Ns.resize(r + 1, 0);
+            _Ns[r]++;
         }
         _p = _avg_k/(N*N);
     }
@@ -265,23 +566,21 @@ public:
     void Update(size_t k, size_t old_s, size_t s)
     {
         _Ns[old_s]--;
-        if (_Ns[old_s] == 0)
-            _Ns.erase(old_s);
+        if (s >= _Ns.size())
+            _Ns.resize(s + 1, 0);
         _Ns[s]++;
     }
 
     double operator()(size_t k, size_t s) const
     {
-        size_t ns = 0;
-        typeof(_Ns.begin()) iter = _Ns.find(s);
-        if (iter != _Ns.end())
-            ns = iter->second;
-        return _p*ns;
+        if (s >= _Ns.size())
+            return 0;
+        return _p*_Ns[s];
     }
 
 private:
     double _p;
-    unordered_map<size_t,size_t> _Ns;
+    vector<size_t> _Ns; // indexed by spin
 };
 
 template <class Graph, class CommunityMap>
@@ -295,31 +594,34 @@ public:
         {
             size_t k = out_degree_no_loops(*v, _g);
             _K += k;
-            _Ks[s[*v]] += k;
+            size_t r = s[*v];
+            if (r >= _Ks.size())
+                _Ks.resize(r + 1, 0);
+            _Ks[r] += k;
         }
     }
 
+    // the total degree of each community is kept up to date incrementally,
+    // so this is O(1) per spin flip
     void Update(size_t k, size_t old_s, size_t s)
     {
         _Ks[old_s] -= k;
-        if (_Ks[old_s] == 0)
-            _Ks.erase(old_s);
+        if (s >= _Ks.size())
+            _Ks.resize(s + 1, 0);
         _Ks[s] += k;
     }
 
     double operator()(size_t k, size_t s) const
     {
-        size_t ks = 0;
-        typeof(_Ks.begin()) iter = _Ks.find(s);
-        if (iter != _Ks.end())
-            ks = iter->second;
-        return k*ks/double(_K);
+        if (s >= _Ks.size())
+            return 0;
+        return k*_Ks[s]/double(_K);
     }
 
 private:
     const Graph& _g;
     size_t _K;
-    unordered_map<size_t,size_t> _Ks;
+    vector<size_t> _Ks; // total degree, indexed by spin
 };
 
 template <class Graph, class CommunityMap>
@@ -464,10 +766,12 @@ enum comm_corr_t
 struct get_communities_selector
 {
     get_communities_selector(comm_corr_t corr,
-                             GraphInterface::vertex_index_map_t index)
-        : _corr(corr), _index(index) {}
+                             GraphInterface::vertex_index_map_t index,
+                             size_t patience = 0, size_t eval_every = 1)
+        : _corr(corr), _index(index), _stop(patience, eval_every) {}
     comm_corr_t _corr;
     GraphInterface::vertex_index_map_t _index;
+    pair<size_t, size_t> _stop;
 
     template <class Graph, class WeightMap, class CommunityMap>
     void operator()(const Graph& g, WeightMap weights, CommunityMap s,
@@ -480,57 +784,166 @@ struct get_communities_selector
         case ERDOS_REYNI:
             get_communities<NNKSErdosReyni>()(g, _index, weights, s, gamma,
                                               n_iter, Tinterval, Nspins, seed,
-                                              verbose);
+                                              verbose, _stop);
             break;
         case UNCORRELATED:
             get_communities<NNKSUncorr>()(g, _index, weights, s, gamma, n_iter,
-                                          Tinterval, Nspins, seed, verbose);
+                                          Tinterval, Nspins, seed, verbose,
+                                          _stop);
             break;
         case CORRELATED:
             get_communities<NNKSCorr>()(g, _index, weights, s, gamma, n_iter,
-                                        Tinterval, Nspins, seed, verbose);
+                                        Tinterval, Nspins, seed, verbose,
+                                        _stop);
             break;
         }
     }
 };
 
-// get Newman's modularity of a given community partition
-struct get_modularity
+// get the degree of each vertex, ignoring self-loops, together with the number
+// of edges and their total weight; these do not depend on the partition, and
+// can be reused by get_modularity_cached() below
+struct get_modularity_degrees
 {
-    template <class Graph, class WeightMap, class CommunityMap>
-    void operator()(const Graph& g, WeightMap weights, CommunityMap s,
-                    double& modularity) const
+    template <class Graph, class VertexIndex, class WeightMap>
+    void operator()(const Graph& g, VertexIndex vertex_index, WeightMap weights,
+                    vector<double>& k, size_t& E, double& W) const
     {
-        typedef typename property_traits<WeightMap>::key_type weight_key_t;
-        typedef typename property_traits<CommunityMap>::value_type s_val_t;
-
-        modularity = 0.0;
-        size_t E = 0;
-        double W = 0;
-
+        E = 0;
+        W = 0;
         typename graph_traits<Graph>::edge_iterator e, e_end;
         for (tie(e,e_end) = edges(g); e != e_end; ++e)
             if (target(*e,g) != source(*e,g))
             {
                 W += get(weights, *e);
                 E++;
-                if (get(s, target(*e,g)) == get(s, source(*e,g)))
-                    modularity += 2 * get(weights, weight_key_t(*e));
             }
 
-        unordered_map<s_val_t, size_t> Ks;
+        k.clear();
+        k.resize(num_vertices(g), 0);
+        typename graph_traits<Graph>::vertex_iterator v, v_end;
+        for (tie(v,v_end) = vertices(g); v != v_end; ++v)
+            k[vertex_index[*v]] = out_degree_no_loops(*v, g);
+    }
+};
+
+// get Newman's modularity of a given community partition, with the degrees,
+// number of edges and total weight given by get_modularity_degrees()
+struct get_modularity_cached
+{
+    template <class Graph, class VertexIndex, class WeightMap,
+              class CommunityMap, class DegreeArray>
+    void operator()(const Graph& g, VertexIndex vertex_index, WeightMap weights,
+                    CommunityMap s, const DegreeArray& k, size_t E, double W,
+                    double& modularity) const
+    {
+        typedef typename property_traits<WeightMap>::key_type weight_key_t;
+
+        modularity = 0.0;
+
+        typename graph_traits<Graph>::edge_iterator e, e_end;
+        for (tie(e,e_end) = edges(g); e != e_end; ++e)
+            if (target(*e,g) != source(*e,g) &&
+                get(s, target(*e,g)) == get(s, source(*e,g)))
+                modularity += 2 * get(weights, weight_key_t(*e));
+
+        vector<size_t> label;
+        size_t C = get_community_labels(g, vertex_index, s, label);
+        vector<double> Ks(C, 0.);
 
         typename graph_traits<Graph>::vertex_iterator v, v_end;
         for (tie(v,v_end) = vertices(g); v != v_end; ++v)
-            Ks[get(s, *v)] += out_degree_no_loops(*v, g);
+            Ks[label[vertex_index[*v]]] += k[vertex_index[*v]];
 
-        for (typeof(Ks.begin()) iter = Ks.begin(); iter != Ks.end(); ++iter)
-            modularity -= (iter->second*iter->second)/double(2*E);
+        for (size_t r = 0; r < C; ++r)
+            modularity -= (Ks[r]*Ks[r])/double(2*E);
 
         modularity /= 2*W;
     }
 };
 
+// read-only property map with the values of a given column of a [V, K]
+// partition array
+template <class VertexIndex>
+class partition_column_map
+    : public put_get_helper<int64_t, partition_column_map<VertexIndex> >
+{
+public:
+    typedef int64_t value_type;
+    typedef value_type reference;
+    typedef typename property_traits<VertexIndex>::key_type key_type;
+    typedef readable_property_map_tag category;
+
+    partition_column_map(const multi_array_ref<int64_t,2>& partitions,
+                         size_t r, VertexIndex vertex_index)
+        : _partitions(partitions), _r(r), _vertex_index(vertex_index) {}
+
+    value_type operator[](const key_type& v) const
+    {
+        return _partitions[_vertex_index[v]][_r];
+    }
+
+private:
+    const multi_array_ref<int64_t,2>& _partitions;
+    size_t _r;
+    VertexIndex _vertex_index;
+};
+
+// get Newman's modularity of several partitions at once, given by the columns
+// of a [V, K] array. The edges are traversed only once for all partitions.
+struct get_modularity_batch
+{
+    template <class Graph, class VertexIndex, class WeightMap>
+    void operator()(const Graph& g, VertexIndex vertex_index, WeightMap weights,
+                    const multi_array_ref<int64_t,2>& partitions,
+                    vector<double>& modularity) const
+    {
+        typedef typename property_traits<WeightMap>::key_type weight_key_t;
+
+        size_t K = partitions.shape()[1];
+        modularity.clear();
+        modularity.resize(K, 0.0);
+        size_t E = 0;
+        double W = 0;
+
+        typename graph_traits<Graph>::edge_iterator e, e_end;
+        for (tie(e,e_end) = edges(g); e != e_end; ++e)
+        {
+            size_t s = vertex_index[source(*e,g)];
+            size_t t = vertex_index[target(*e,g)];
+            if (s == t)
+                continue;
+            double w = get(weights, weight_key_t(*e));
+            W += w;
+            E++;
+            for (size_t r = 0; r < K; ++r)
+                if (partitions[s][r] == partitions[t][r])
+                    modularity[r] += 2 * w;
+        }
+
+        vector<double> k(num_vertices(g), 0);
+        typename graph_traits<Graph>::vertex_iterator v, v_end;
+        for (tie(v,v_end) = vertices(g); v != v_end; ++v)
+            k[vertex_index[*v]] = out_degree_no_loops(*v, g);
+
+        // the communities of each partition are labeled in the range
+        // [0, C-1], as in get_modularity_cached()
+        vector<size_t> label;
+        vector<double> Ks;
+        for (size_t r = 0; r < K; ++r)
+        {
+            partition_column_map<VertexIndex> s(partitions, r, vertex_index);
+            size_t C = get_community_labels(g, vertex_index, s, label);
+            Ks.assign(C, 0.);
+            for (tie(v,v_end) = vertices(g); v != v_end; ++v)
+                Ks[label[vertex_index[*v]]] += k[vertex_index[*v]];
+            for (size_t c = 0; c < C; ++c)
+                modularity[r] -= (Ks[c]*Ks[c])/double(2*E);
+            modularity[r] /= 2*W;
+        }
+    }
+};
+
 } // graph_tool namespace
 
 #endif //GRAPH_COMMUNITY_HH
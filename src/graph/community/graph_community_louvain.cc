@@ -0,0 +1,74 @@
+// graph-tool -- a general graph modification and manipulation thingy
+//
+// Copyright (C) 2007-2011 Tiago de Paula Peixoto <tiago@skewed.de>
+//
+// This program is free software; you can redistribute it and/or
+// modify it under the terms of the GNU General Public License
+// as published by the Free Software Foundation; either version 3
+// of the License, or (at your option) any later version.
+//
+// This program is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+#include "graph_filtering.hh"
+#include "graph.hh"
+#include "graph_selectors.hh"
+#include "graph_properties.hh"
+
+#include <boost/bind.hpp>
+#include <boost/bind/placeholders.hpp>
+#include <boost/python.hpp>
+
+#include "graph_community_louvain.hh"
+
+using namespace std;
+using namespace boost;
+
+using namespace graph_tool;
+
+
+void louvain(GraphInterface& g, double gamma, string corr_name,
+             size_t max_iter, size_t seed, bool verbose, boost::any weight,
+             boost::any property)
+{
+    typedef property_map_types::apply<mpl::vector<int32_t,int64_t>,
+                                      GraphInterface::vertex_index_map_t,
+                                      mpl::bool_<false> >::type
+        allowed_spin_properties;
+
+    if (!belongs<allowed_spin_properties>()(property))
+        throw ValueException("vertex property is not of integer type int32_t "
+                             "or int64_t");
+
+    typedef DynamicPropertyMapWrap<double,GraphInterface::edge_t> weight_map_t;
+    typedef ConstantPropertyMap<double,GraphInterface::edge_t> no_weight_map_t;
+    typedef mpl::vector<weight_map_t,no_weight_map_t> weight_properties;
+
+    if (weight.empty())
+        weight = no_weight_map_t(1.0);
+    else
+        weight = weight_map_t(weight, edge_scalar_properties());
+
+    comm_corr_t corr;
+    if (corr_name ==  "erdos")
+        corr = ERDOS_REYNI;
+    else if (corr_name == "uncorrelated")
+        corr = UNCORRELATED;
+    else if (corr_name == "correlated")
+        throw ValueException("correlation type 'correlated' is not supported "
+                             "by the louvain method");
+    else
+        throw ValueException("invalid correlation type: " + corr_name);
+
+    GILRelease gil_release;
+    run_action<graph_tool::detail::never_directed>()
+        (g, bind<void>(get_communities_louvain(), _1, g.GetVertexIndex(),
+                       _2, _3, gamma, corr, max_iter, seed, verbose),
+         weight_properties(), allowed_spin_properties())
+        (weight, property);
+}
@@ -0,0 +1,350 @@
+// graph-tool -- a general graph modification and manipulation thingy
+//
+// Copyright (C) 2007-2011 Tiago de Paula Peixoto <tiago@skewed.de>
+//
+// This program is free software; you can redistribute it and/or
+// modify it under the terms of the GNU General Public License
+// as published by the Free Software Foundation; either version 3
+// of the License, or (at your option) any later version.
+//
+// This program is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+#ifndef GRAPH_COMMUNITY_LOUVAIN_HH
+#define GRAPH_COMMUNITY_LOUVAIN_HH
+
+#include <iostream>
+#include <iomanip>
+
+#include "graph_community.hh"
+
+namespace graph_tool
+{
+
+using namespace std;
+using namespace boost;
+
+// computes the community structure through the greedy multi-level modularity
+// optimization of Blondel et al. ("louvain" method). Each level consists of a
+// local-move phase, where vertices are moved to the neighbouring community
+// which yields the largest gain, followed by a contraction of the communities
+// into single vertices of a weighted network, which is then used in the next
+// level.
+
+// weighted network of (contracted) communities, stored in a compressed sparse
+// row layout. The self-weights are the total weight inside each node, i.e.,
+// sum_{i,j in node} A_ij.
+struct louvain_network
+{
+    vector<size_t> row;       // row offsets
+    vector<size_t> nbr;       // neighbour nodes
+    vector<double> w;         // neighbour weights
+    vector<double> self_w;    // internal node weights
+    vector<double> k;         // (weighted) degree
+    vector<double> size;      // number of original vertices
+
+    size_t num_nodes() const { return k.size(); }
+};
+
+class louvain_optimizer
+{
+public:
+    louvain_optimizer(louvain_network& net, double gamma, double f,
+                      comm_corr_t corr)
+        : _net(net), _gamma(gamma), _f(f), _corr(corr),
+          _comm(net.num_nodes()), _tot(net.num_nodes(), 0.),
+          _neigh_w(net.num_nodes(), 0.), _is_touched(net.num_nodes(), false)
+    {
+        for (size_t i = 0; i < _net.num_nodes(); ++i)
+        {
+            _comm[i] = i;
+            _tot[i] = null_weight(i);
+        }
+    }
+
+    // the "null model" weight of a node, i.e. its contribution to the
+    // expected number of edges inside its community
+    double null_weight(size_t i) const
+    {
+        return (_corr == ERDOS_REYNI) ? _net.size[i] : _net.k[i];
+    }
+
+    // perform local moves until no vertex changes community, or max_iter
+    // sweeps are done. Returns the total number of moves.
+    size_t local_moves(size_t max_iter, rng_t& rng)
+    {
+        size_t N = _net.num_nodes();
+        vector<size_t> order(N);
+        for (size_t i = 0; i < N; ++i)
+            order[i] = i;
+
+        vector<size_t> touched;
+        size_t total_moves = 0;
+        for (size_t iter = 0; max_iter == 0 || iter < max_iter; ++iter)
+        {
+            for (size_t i = 0; i + 1 < N; ++i)
+            {
+                tr1::uniform_int<size_t> random(i, N - 1);
+                swap(order[i], order[random(rng)]);
+            }
+
+            size_t moves = 0;
+            for (size_t oi = 0; oi < N; ++oi)
+            {
+                size_t i = order[oi];
+                size_t c_old = _comm[i];
+                double a_i = null_weight(i);
+
+                // weights towards neighbouring communities; these are marked
+                // separately, since their weights may be zero
+                for (size_t j = _net.row[i]; j < _net.row[i + 1]; ++j)
+                {
+                    size_t c = _comm[_net.nbr[j]];
+                    if (!_is_touched[c])
+                    {
+                        _is_touched[c] = true;
+                        touched.push_back(c);
+                    }
+                    _neigh_w[c] += _net.w[j];
+                }
+
+                _tot[c_old] -= a_i;
+
+                size_t best = c_old;
+                double best_gain = _neigh_w[c_old] -
+                    _gamma * _f * a_i * _tot[c_old];
+                for (size_t j = 0; j < touched.size(); ++j)
+                {
+                    size_t c = touched[j];
+                    double gain = _neigh_w[c] - _gamma * _f * a_i * _tot[c];
+                    if (gain > best_gain)
+                    {
+                        best_gain = gain;
+                        best = c;
+                    }
+                }
+
+                _tot[best] += a_i;
+                if (best != c_old)
+                {
+                    _comm[i] = best;
+                    moves++;
+                }
+
+                for (size_t j = 0; j < touched.size(); ++j)
+                {
+                    _neigh_w[touched[j]] = 0;
+                    _is_touched[touched[j]] = false;
+                }
+                touched.clear();
+            }
+            total_moves += moves;
+            if (moves == 0)
+                break;
+        }
+        return total_moves;
+    }
+
+    // rename the communities to the range [0, C-1], and return C
+    size_t relabel()
+    {
+        vector<size_t> label(_net.num_nodes(),
+                             numeric_limits<size_t>::max());
+        size_t C = 0;
+        for (size_t i = 0; i < _comm.size(); ++i)
+        {
+            size_t& l = label[_comm[i]];
+            if (l == numeric_limits<size_t>::max())
+                l = C++;
+            _comm[i] = l;
+        }
+        return C;
+    }
+
+    // contract the (relabeled) communities into the nodes of a new network
+    void contract(size_t C, louvain_network& cnet) const
+    {
+        vector<vector<size_t> > members(C);
+        for (size_t i = 0; i < _comm.size(); ++i)
+            members[_comm[i]].push_back(i);
+
+        cnet.row.assign(C + 1, 0);
+        cnet.nbr.clear();
+        cnet.w.clear();
+        cnet.self_w.assign(C, 0.);
+        cnet.k.assign(C, 0.);
+        cnet.size.assign(C, 0.);
+
+        vector<double> neigh_w(C, 0.);
+        vector<bool> is_touched(C, false);
+        vector<size_t> touched;
+        for (size_t c = 0; c < C; ++c)
+        {
+            for (size_t m = 0; m < members[c].size(); ++m)
+            {
+                size_t i = members[c][m];
+                cnet.self_w[c] += _net.self_w[i];
+                cnet.k[c] += _net.k[i];
+                cnet.size[c] += _net.size[i];
+                for (size_t j = _net.row[i]; j < _net.row[i + 1]; ++j)
+                {
+                    size_t d = _comm[_net.nbr[j]];
+                    if (d == c)
+                    {
+                        cnet.self_w[c] += _net.w[j];
+                        continue;
+                    }
+                    if (!is_touched[d])
+                    {
+                        is_touched[d] = true;
+                        touched.push_back(d);
+                    }
+                    neigh_w[d] += _net.w[j];
+                }
+            }
+            for (size_t j = 0; j < touched.size(); ++j)
+            {
+                cnet.nbr.push_back(touched[j]);
+                cnet.w.push_back(neigh_w[touched[j]]);
+                neigh_w[touched[j]] = 0;
+                is_touched[touched[j]] = false;
+            }
+            touched.clear();
+            cnet.row[c + 1] = cnet.nbr.size();
+        }
+    }
+
+    // modularity of the current partition
+    double modularity(double W) const
+    {
+        vector<double> in(_net.num_nodes(), 0.);
+        for (size_t i = 0; i < _net.num_nodes(); ++i)
+        {
+            size_t c = _comm[i];
+            in[c] += _net.self_w[i];
+            for (size_t j = _net.row[i]; j < _net.row[i + 1]; ++j)
+                if (_comm[_net.nbr[j]] == c)
+                    in[c] += _net.w[j];
+        }
+        double Q = 0;
+        for (size_t c = 0; c < in.size(); ++c)
+            Q += in[c] - _gamma * _f * _tot[c] * _tot[c];
+        return Q / W;
+    }
+
+    const vector<size_t>& get_communities() const { return _comm; }
+
+private:
+    louvain_network& _net;
+    double _gamma;
+    double _f;
+    comm_corr_t _corr;
+    vector<size_t> _comm;
+    vector<double> _tot;
+    vector<double> _neigh_w;
+    vector<bool> _is_touched;
+};
+
+struct get_communities_louvain
+{
+    template <class Graph, class VertexIndex, class WeightMap,
+              class CommunityMap>
+    void operator()(const Graph& g, VertexIndex vertex_index, WeightMap weights,
+                    CommunityMap s, double gamma, comm_corr_t corr,
+                    size_t max_iter, size_t seed, bool verbose) const
+    {
+        typedef typename graph_traits<Graph>::vertex_descriptor vertex_t;
+        typedef typename property_traits<WeightMap>::key_type weight_key_t;
+
+        rng_t rng(static_cast<rng_t::result_type>(seed));
+
+        // build the initial network, ignoring self-loops
+        louvain_network net;
+        size_t N = num_vertices(g), NV = 0;
+        net.row.resize(N + 1, 0);
+        net.self_w.resize(N, 0.);
+        net.k.resize(N, 0.);
+        net.size.resize(N, 0.);
+        double W = 0; // total weight (twice the number of edges)
+        for (size_t i = 0; i < N; ++i)
+        {
+            vertex_t v = vertex(i, g);
+            if (v != graph_traits<Graph>::null_vertex())
+            {
+                NV++;
+                net.size[i] = 1;
+                typename graph_traits<Graph>::out_edge_iterator e, e_end;
+                for (tie(e, e_end) = out_edges(v, g); e != e_end; ++e)
+                {
+                    vertex_t t = target(*e, g);
+                    if (t == v)
+                        continue;
+                    double w = get(weights, weight_key_t(*e));
+                    net.nbr.push_back(vertex_index[t]);
+                    net.w.push_back(w);
+                    net.k[i] += w;
+                    W += w;
+                }
+            }
+            net.row[i + 1] = net.nbr.size();
+        }
+
+        // vertex -> community of the current level
+        vector<size_t> comm(N);
+        for (size_t i = 0; i < N; ++i)
+            comm[i] = i;
+
+        if (W > 0)
+        {
+            // normalization of the null model term
+            double f = (corr == ERDOS_REYNI) ?
+                W / (double(NV) * NV) : 1. / W;
+
+            for (size_t level = 0; ; ++level)
+            {
+                louvain_optimizer opt(net, gamma, f, corr);
+                size_t moves = opt.local_moves(max_iter, rng);
+                size_t C = opt.relabel();
+
+                if (verbose)
+                    cout << "level " << level << ": " << moves << " moves, "
+                         << C << " communities, modularity: "
+                         << setprecision(10) << opt.modularity(W) << endl;
+
+                const vector<size_t>& c = opt.get_communities();
+                for (size_t i = 0; i < N; ++i)
+                    comm[i] = c[comm[i]];
+
+                if (moves == 0 || C == net.num_nodes())
+                    break;
+
+                louvain_network cnet;
+                opt.contract(C, cnet);
+                swap(net, cnet);
+            }
+        }
+
+        // rename spins, starting from zero
+        vector<size_t> label(N, numeric_limits<size_t>::max());
+        size_t C = 0;
+        for (size_t i = 0; i < N; ++i)
+        {
+            vertex_t v = vertex(i, g);
+            if (v == graph_traits<Graph>::null_vertex())
+                continue;
+            size_t& l = label[comm[i]];
+            if (l == numeric_limits<size_t>::max())
+                l = C++;
+            s[v] = l;
+        }
+    }
+};
+
+} // graph_tool namespace
+
+#endif //GRAPH_COMMUNITY_LOUVAIN_HH
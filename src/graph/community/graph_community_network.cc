@@ -61,7 +61,7 @@ void community_network(GraphInterface& gi, GraphInterface& cgi,
         throw ValueException("invalid vertex count property");
     }
 
-    typedef property_map_types::apply<mpl::vector<int32_t,double>,
+    typedef property_map_types::apply<mpl::vector<int32_t,int64_t,double>,
                                       GraphInterface::edge_index_map_t,
                                       mpl::bool_<false> >::type
         ecount_properties;
@@ -70,7 +70,7 @@ void community_network(GraphInterface& gi, GraphInterface& cgi,
         throw ValueException("invalid edge count property");
 
      run_action<>()(gi, bind<void>(get_community_network(), _1,
-                                   ref(cgi.GetGraph()), cgi.GetVertexIndex(),
+                                   ref(cgi.GetGraph()), gi.GetVertexIndex(),
                                    cgi.GetEdgeIndex(), _2,
                                    condensed_community_property,
                                    _3, vcount, _4),
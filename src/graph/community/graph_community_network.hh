@@ -26,6 +26,8 @@
 #include <iostream>
 #include <iomanip>
 
+#include "graph_community.hh"
+
 namespace graph_tool
 {
 
@@ -40,7 +42,7 @@ struct get_community_network
               class WeightMap, class EdgeIndex, class VertexIndex,
               class VertexProperty, class EdgeProperty>
     void operator()(const Graph& g, CommunityGraph& cg,
-                    VertexIndex cvertex_index, EdgeIndex cedge_index,
+                    VertexIndex vertex_index, EdgeIndex cedge_index,
                     CommunityMap s_map, boost::any acs_map, WeightMap weight,
                     VertexProperty vertex_count, EdgeProperty edge_count) const
     {
@@ -50,30 +52,36 @@ struct get_community_network
             cvertex_t;
         typedef typename graph_traits<CommunityGraph>::edge_descriptor
             cedge_t;
-        typedef typename boost::property_traits<CommunityMap>::value_type
-            s_type;
 
         typedef typename get_prop_type<CommunityMap, VertexIndex>::type
             comm_map_t;
 
         comm_map_t cs_map = boost::any_cast<comm_map_t>(acs_map);
 
-        tr1::unordered_map<s_type, vector<vertex_t>, hash<s_type> >
-            comms;
+        // the communities are indexed by their labels in the range [0, C-1],
+        // so that they can be kept in flat arrays
+        vector<size_t> label;
+        size_t C = get_community_labels(g, vertex_index, s_map, label);
+
+        vector<vector<vertex_t> > comms(C);
         typename graph_traits<Graph>::vertex_iterator v, v_end;
         for (tie(v, v_end) = vertices(g); v != v_end; ++v)
-            comms[get(s_map, *v)].push_back(*v);
+            comms[label[vertex_index[*v]]].push_back(*v);
 
-        // create vertices
-        tr1::unordered_map<s_type, cvertex_t, hash<s_type> >
-            comm_vertices;
-        for (typeof(comms.begin()) iter = comms.begin(); iter != comms.end();
-             ++iter)
+        // create vertices; the property maps are resized only once, instead
+        // of growing as each vertex is added
+        vector<cvertex_t> comm_vertices(C);
+        vertex_count.reserve(num_vertices(cg) + C);
+        reserve_dispatch(cs_map, num_vertices(cg) + C,
+                         typename boost::is_convertible
+                            <typename property_traits<CommunityMap>::category,
+                             writable_property_map_tag>::type());
+        for (size_t r = 0; r < C; ++r)
         {
             cvertex_t v = add_vertex(cg);
-            vertex_count[v] = iter->second.size();
-            comm_vertices[iter->first] = v;
-            put_dispatch(cs_map, v, iter->first,
+            vertex_count[v] = comms[r].size();
+            comm_vertices[r] = v;
+            put_dispatch(cs_map, v, get(s_map, comms[r].front()),
                          typename boost::is_convertible
                             <typename property_traits<CommunityMap>::category,
                              writable_property_map_tag>::type());
@@ -83,18 +91,17 @@ struct get_community_network
         tr1::unordered_map<pair<size_t, size_t>,
                            cedge_t, hash<pair<size_t, size_t> > >
             comm_edges;
-        for (typeof(comms.begin()) iter = comms.begin(); iter != comms.end();
-             ++iter)
+        for (size_t r = 0; r < C; ++r)
         {
-            cvertex_t cs = comm_vertices[iter->first];
-            for (size_t i = 0; i < iter->second.size(); ++i)
+            cvertex_t cs = comm_vertices[r];
+            for (size_t i = 0; i < comms[r].size(); ++i)
             {
-                vertex_t s = iter->second[i];
+                vertex_t s = comms[r][i];
                 typename graph_traits<Graph>::out_edge_iterator e, e_end;
                 for (tie(e, e_end) = out_edges(s, g); e != e_end; ++e)
                 {
                     vertex_t t = target(*e, g);
-                    cvertex_t ct = comm_vertices[get(s_map, t)];
+                    cvertex_t ct = comm_vertices[label[vertex_index[t]]];
                     if (ct == cs) // self-loops are pointless
                         continue;
                     cedge_t ce;
@@ -159,6 +166,19 @@ struct get_community_network
     {
     }
 
+    template <class PropertyMap>
+    void reserve_dispatch(PropertyMap cs_map, size_t size,
+                          mpl::true_ is_writable) const
+    {
+        cs_map.reserve(size);
+    }
+
+    template <class PropertyMap>
+    void reserve_dispatch(PropertyMap cs_map, size_t size,
+                          mpl::false_ is_writable) const
+    {
+    }
+
 };
 
 } // graph_tool namespace
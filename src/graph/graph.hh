@@ -211,6 +211,18 @@ private:
     bool _edge_filter_active;
 };
 
+// Releases the python GIL during its lifetime, so that other python threads can
+// run while a lengthy computation takes place. No python objects may be
+// accessed while it is in scope.
+class GILRelease
+{
+public:
+    GILRelease() { _state = PyEval_SaveThread(); }
+    ~GILRelease() { PyEval_RestoreThread(_state); }
+private:
+    PyThreadState* _state;
+};
+
 } //namespace graph_tool
 
 #endif
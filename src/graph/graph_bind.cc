@@ -25,6 +25,10 @@
 #include "graph_python_interface.hh"
 #include "graph_util.hh"
 
+#ifdef USING_OPENMP
+#include <omp.h>
+#endif
+
 #ifdef HAVE_SCIPY // integration with scipy weave
 #include "weave/scxx/object.h"
 #include "weave/scxx/list.h"
@@ -314,6 +318,24 @@ bool openmp_enabled()
 #endif
 }
 
+// the maximum number of threads used by parallel regions started from the
+// calling thread
+size_t openmp_get_num_threads()
+{
+#ifdef USING_OPENMP
+    return omp_get_max_threads();
+#else
+    return 1;
+#endif
+}
+
+void openmp_set_num_threads(size_t n)
+{
+#ifdef USING_OPENMP
+    omp_set_num_threads(n);
+#endif
+}
+
 void ungroup_vector_property(GraphInterface& g, boost::any vector_prop,
                              boost::any prop, size_t pos, bool edge);
 void group_vector_property(GraphInterface& g, boost::any vector_prop,
@@ -340,6 +362,8 @@ BOOST_PYTHON_MODULE(libgraph_tool_core)
 
     def("graph_filtering_enabled", &graph_filtering_enabled);
     def("openmp_enabled", &openmp_enabled);
+    def("openmp_get_num_threads", &openmp_get_num_threads);
+    def("openmp_set_num_threads", &openmp_set_num_threads);
 
     mpl::for_each<mpl::push_back<scalar_types,string>::type>(export_vector_types());
 
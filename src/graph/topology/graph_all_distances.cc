@@ -21,7 +21,7 @@
 #include <boost/python.hpp>
 
 #include <boost/graph/johnson_all_pairs_shortest.hpp>
-#include <boost/graph/floyd_warshall_shortest.hpp>
+#include <boost/graph/detail/d_ary_heap.hpp>
 
 using namespace std;
 using namespace boost;
@@ -29,12 +29,72 @@ using namespace graph_tool;
 
 struct do_all_pairs_search
 {
+    // Floyd-Warshall algorithm, done directly on the rows of the distance
+    // map. For a given k, the rows are independent, and are relaxed in
+    // parallel; the inner loop runs over contiguous memory, with a loop
+    // invariant d[i][k], so that it can be vectorized by the compiler.
+    template <class Graph, class VertexIndexMap, class DistMap, class WeightMap>
+    void floyd_warshall(const Graph& g, VertexIndexMap vertex_index,
+                        DistMap dist_map, WeightMap weight) const
+    {
+        typedef typename property_traits<WeightMap>::value_type dist_t;
+        const dist_t inf = numeric_limits<dist_t>::max();
+
+        size_t N = num_vertices(g);
+        vector<size_t> vs;    // indexes of the valid vertices
+        vector<dist_t*> d;    // their rows in the distance map
+
+        typename graph_traits<Graph>::vertex_iterator v, v_end;
+        for (tie(v, v_end) = vertices(g); v != v_end; ++v)
+        {
+            vs.push_back(vertex_index[*v]);
+            d.push_back(&dist_map[*v][0]);
+            for (size_t j = 0; j < N; ++j)
+                d.back()[j] = inf;
+            d.back()[vs.back()] = 0;
+        }
+
+        size_t p = 0;
+        for (tie(v, v_end) = vertices(g); v != v_end; ++v, ++p)
+        {
+            typename graph_traits<Graph>::out_edge_iterator e, e_end;
+            for (tie(e, e_end) = out_edges(*v, g); e != e_end; ++e)
+            {
+                dist_t& d_uv = d[p][vertex_index[target(*e, g)]];
+                d_uv = min(d_uv, dist_t(get(weight, *e)));
+            }
+        }
+
+        int i, M = vs.size();
+        for (int k = 0; k < M; ++k)
+        {
+            const dist_t* d_k = d[k];
+            #pragma omp parallel for default(shared) private(i) \
+                schedule(static)
+            for (i = 0; i < M; ++i)
+            {
+                dist_t* d_i = d[i];
+                const dist_t d_ik = d_i[vs[k]];
+                if (d_ik == inf)
+                    continue;
+                for (size_t j = 0; j < N; ++j)
+                {
+                    // d_k[j] == inf must not be added, as it may overflow
+                    dist_t d_kj = d_k[j];
+                    dist_t d_ij = (d_kj == inf) ? inf : dist_t(d_ik + d_kj);
+                    d_i[j] = min(d_i[j], d_ij);
+                }
+            }
+        }
+    }
+
     template <class Graph, class VertexIndexMap, class DistMap, class WeightMap>
     void operator()(const Graph& g, VertexIndexMap vertex_index,
                     DistMap dist_map, WeightMap weight, bool dense) const
     {
         typedef typename property_traits<DistMap>::value_type::value_type
             dist_t;
+        typedef typename graph_traits<Graph>::vertex_descriptor vertex_t;
 
         int i, N = num_vertices(g);
         #pragma omp parallel for default(shared) private(i) schedule(dynamic)
@@ -46,17 +106,85 @@ struct do_all_pairs_search
 
         if (dense)
         {
-            floyd_warshall_all_pairs_shortest_paths
-                (g, dist_map,
-                 weight_map(ConvertedPropertyMap<WeightMap,dist_t>(weight)).
-                 vertex_index_map(vertex_index));
+            floyd_warshall(g, vertex_index, dist_map,
+                           ConvertedPropertyMap<WeightMap,dist_t>(weight));
         }
         else
         {
-            johnson_all_pairs_shortest_paths
-                (g, dist_map,
-                 weight_map(ConvertedPropertyMap<WeightMap,dist_t>(weight)).
-                 vertex_index_map(vertex_index));
+            // without negative weights, the Dijkstra searches from each
+            // source are independent, and are done in parallel; otherwise
+            // Johnson's algorithm is needed, to reweight the edges
+            bool negative = false;
+            typename graph_traits<Graph>::edge_iterator e, e_end;
+            for (tie(e, e_end) = edges(g); e != e_end; ++e)
+            {
+                if (get(weight, *e) < 0)
+                {
+                    negative = true;
+                    break;
+                }
+            }
+
+            if (negative)
+            {
+                johnson_all_pairs_shortest_paths
+                    (g, dist_map,
+                     weight_map(ConvertedPropertyMap<WeightMap,dist_t>(weight)).
+                     vertex_index_map(vertex_index));
+                return;
+            }
+
+            #pragma omp parallel default(shared) private(i)
+            {
+                // the distances and the heap are allocated once per thread,
+                // and reused for all its sources
+                typedef unchecked_vector_property_map<dist_t, VertexIndexMap>
+                    tdist_map_t;
+                typedef unchecked_vector_property_map<size_t, VertexIndexMap>
+                    index_in_heap_t;
+                tdist_map_t dist(vertex_index, N);
+                index_in_heap_t index_in_heap(vertex_index, N);
+                d_ary_heap_indirect<vertex_t, 4, index_in_heap_t, tdist_map_t,
+                                    std::less<dist_t> >
+                    queue(dist, index_in_heap);
+                vector<dist_t>& d = dist.get_storage();
+                ConvertedPropertyMap<WeightMap,dist_t> w(weight);
+
+                #pragma omp for schedule(dynamic)
+                for (i = 0; i < N; ++i)
+                {
+                    vertex_t s = vertex(i, g);
+                    if (s == graph_traits<Graph>::null_vertex())
+                        continue;
+                    fill(d.begin(), d.end(), numeric_limits<dist_t>::max());
+                    dist[s] = 0;
+                    queue.push(s);
+                    while (!queue.empty())
+                    {
+                        vertex_t u = queue.top();
+                        queue.pop();
+                        typename graph_traits<Graph>::out_edge_iterator
+                            oe, oe_end;
+                        for (tie(oe, oe_end) = out_edges(u, g); oe != oe_end;
+                             ++oe)
+                        {
+                            vertex_t v = target(*oe, g);
+                            dist_t dv = dist[u] + get(w, *oe);
+                            if (dv < dist[v])
+                            {
+                                bool queued =
+                                    dist[v] != numeric_limits<dist_t>::max();
+                                dist[v] = dv;
+                                if (queued)
+                                    queue.update(v);
+                                else
+                                    queue.push(v);
+                            }
+                        }
+                    }
+                    copy(d.begin(), d.end(), dist_map[i].begin());
+                }
+            }
         }
     }
 };
@@ -69,6 +197,7 @@ void get_all_dists(GraphInterface& gi, boost::any dist_map, boost::any weight,
     if (weight.empty())
         weight = boost::any(cweight_map_t(1));
 
+    GILRelease gil_release;
     run_action<>()
         (gi,
          bind<void>(do_all_pairs_search(), _1, gi.GetVertexIndex(),
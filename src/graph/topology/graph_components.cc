@@ -36,6 +36,13 @@ python::object do_label_components(GraphInterface& gi, boost::any prop)
     return wrap_vector_owned(hist);
 }
 
+void do_label_largest_component(GraphInterface& gi, boost::any prop)
+{
+    run_action<>()(gi, bind<void>(label_largest_component(), _1,
+                                  gi.GetVertexIndex(), _2),
+                   writable_vertex_scalar_properties())(prop);
+}
+
 python::object
 do_label_biconnected_components(GraphInterface& gi, boost::any comp,
                                 boost::any art)
@@ -53,6 +60,7 @@ do_label_biconnected_components(GraphInterface& gi, boost::any comp,
 void export_components()
 {
     python::def("label_components", &do_label_components);
+    python::def("label_largest_component", &do_label_largest_component);
     python::def("label_biconnected_components",
                 &do_label_biconnected_components);
 };
@@ -126,6 +126,27 @@ struct label_components
     }
 };
 
+// this will label the largest component of a graph (or the largest strong
+// component, if it is directed) with a boolean vertex property. The component
+// labels themselves are only kept in a temporary map.
+struct label_largest_component
+{
+    template <class Graph, class VertexIndex, class LabelMap>
+    void operator()(const Graph& g, VertexIndex vertex_index, LabelMap label)
+        const
+    {
+        unchecked_vector_property_map<int32_t, VertexIndex>
+            comp_map(vertex_index, num_vertices(g));
+        vector<size_t> hist;
+        label_components()(g, comp_map, hist);
+        size_t largest = max_element(hist.begin(), hist.end()) - hist.begin();
+
+        typename graph_traits<Graph>::vertex_iterator v, v_end;
+        for (tie(v, v_end) = vertices(g); v != v_end; ++v)
+            put(label, *v, size_t(comp_map[*v]) == largest);
+    }
+};
+
 struct label_biconnected_components
 {
     template <class ArtMap>
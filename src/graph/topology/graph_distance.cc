@@ -17,18 +17,28 @@
 #include "graph_filtering.hh"
 #include "graph_properties.hh"
 #include "graph_selectors.hh"
+#include "graph_python_interface.hh"
+
+#include "numpy_bind.hh"
 
 #include <boost/graph/breadth_first_search.hpp>
-#include <boost/graph/dijkstra_shortest_paths.hpp>
+#include <boost/graph/detail/d_ary_heap.hpp>
+#include <boost/mpl/push_back.hpp>
+#include <boost/type_traits/is_floating_point.hpp>
 
 #include <boost/python.hpp>
 
+#include <functional>
+
 using namespace std;
 using namespace boost;
 using namespace graph_tool;
 
 struct stop_search {};
 
+// weight map used when no weights are given
+typedef ConstantPropertyMap<int32_t,GraphInterface::edge_t> no_weight_map_t;
+
 template <class DistMap, class PredMap>
 class bfs_max_visitor:
     public boost::bfs_visitor<null_visitor>
@@ -63,33 +73,6 @@ private:
     size_t _dist;
 };
 
-template <class DistMap>
-class djk_max_visitor:
-    public boost::dijkstra_visitor<null_visitor>
-{
-public:
-    djk_max_visitor(DistMap dist_map,
-                    typename property_traits<DistMap>::value_type max_dist)
-        : _dist_map(dist_map), _max_dist(max_dist) {}
-
-    template <class Graph>
-    void examine_vertex(typename graph_traits<Graph>::vertex_descriptor u,
-                        Graph& g)
-    {
-        if (_dist_map[u] > _max_dist)
-        {
-            typedef typename property_traits<DistMap>::value_type d_type;
-            _dist_map[u] = numeric_limits<d_type>::max();
-            throw stop_search();
-        }
-    }
-
-private:
-    DistMap _dist_map;
-    typename property_traits<DistMap>::value_type _max_dist;
-};
-
-
 struct do_bfs_search
 {
     template <class Graph, class VertexIndexMap, class DistMap, class PredMap>
@@ -109,6 +92,7 @@ struct do_bfs_search
             if (v == graph_traits<Graph>::null_vertex())
                 continue;
             dist_map[v] = numeric_limits<dist_t>::max();
+            pred_map[v] = v;
         }
         dist_map[vertex(source,g)] = 0;
 
@@ -127,6 +111,9 @@ struct do_bfs_search
     }
 };
 
+// Dijkstra's algorithm with an indexed 4-ary heap, which is shallower than a
+// binary heap, and whose sift-down compares the children of a node inside
+// the same contiguous block of the heap array
 struct do_djk_search
 {
     template <class Graph, class VertexIndexMap, class DistMap, class PredMap,
@@ -135,24 +122,165 @@ struct do_djk_search
                     DistMap dist_map, PredMap pred_map, WeightMap weight,
                     long double max_dist) const
     {
+        typedef typename graph_traits<Graph>::vertex_descriptor vertex_t;
         typedef typename property_traits<DistMap>::value_type dist_t;
         dist_t max_d = (max_dist > 0) ?
             max_dist : numeric_limits<dist_t>::max();
 
-        try
+        int i, N = num_vertices(g);
+        #pragma omp parallel for default(shared) private(i) schedule(dynamic)
+        for (i = 0; i < N; ++i)
         {
-            dijkstra_shortest_paths(g, vertex(source, g),
-                                    weight_map(weight).
-                                    distance_map(dist_map).
-                                    vertex_index_map(vertex_index).
-                                    predecessor_map(pred_map).
-                                    visitor(djk_max_visitor<DistMap>
-                                            (dist_map, max_d)));
+            vertex_t v = vertex(i, g);
+            if (v == graph_traits<Graph>::null_vertex())
+                continue;
+            dist_map[v] = numeric_limits<dist_t>::max();
+            pred_map[v] = v;
+        }
+
+        vertex_t s = vertex(source, g);
+        dist_map[s] = 0;
+
+        typedef unchecked_vector_property_map<size_t, VertexIndexMap>
+            index_in_heap_t;
+        index_in_heap_t index_in_heap(vertex_index, num_vertices(g));
+        d_ary_heap_indirect<vertex_t, 4, index_in_heap_t, DistMap,
+                            std::less<dist_t> > queue(dist_map, index_in_heap);
+        queue.push(s);
+        while (!queue.empty())
+        {
+            vertex_t u = queue.top();
+            queue.pop();
+
+            if (dist_map[u] > max_d)
+            {
+                dist_map[u] = numeric_limits<dist_t>::max();
+                break;
+            }
+
+            typename graph_traits<Graph>::out_edge_iterator e, e_end;
+            for (tie(e, e_end) = out_edges(u, g); e != e_end; ++e)
+            {
+                if (get(weight, *e) < 0)
+                    throw ValueException("negative edge weight found");
+                vertex_t v = target(*e, g);
+                dist_t d = dist_map[u] + get(weight, *e);
+                if (d < dist_map[v])
+                {
+                    // with non-negative weights, a vertex which was already
+                    // reached but is not yet finished must still be queued
+                    bool queued = dist_map[v] != numeric_limits<dist_t>::max();
+                    dist_map[v] = d;
+                    pred_map[v] = u;
+                    if (queued)
+                        queue.update(v);
+                    else
+                        queue.push(v);
+                }
+            }
+        }
+    }
+};
+
+// Dial's algorithm: Dijkstra's algorithm for small non-negative integer
+// weights, where the priority queue is replaced by a circular array of
+// max_weight + 1 buckets, one for each distance value modulo
+// max_weight + 1. Vertices are pushed to the bucket of their tentative
+// distance, and the buckets are emptied in order of increasing distance;
+// vertices which were improved in the meantime are left in their old buckets
+// and skipped.
+struct do_dial_search
+{
+    template <class Graph, class VertexIndexMap, class DistMap, class PredMap,
+              class WeightMap>
+    void operator()(const Graph& g, size_t source, VertexIndexMap vertex_index,
+                    DistMap dist_map, PredMap pred_map, WeightMap weight,
+                    long double max_dist, size_t max_weight) const
+    {
+        typedef typename graph_traits<Graph>::vertex_descriptor vertex_t;
+        typedef typename property_traits<DistMap>::value_type dist_t;
+        dist_t max_d = (max_dist > 0) ?
+            max_dist : numeric_limits<dist_t>::max();
+
+        int i, N = num_vertices(g);
+        #pragma omp parallel for default(shared) private(i) schedule(dynamic)
+        for (i = 0; i < N; ++i)
+        {
+            vertex_t v = vertex(i, g);
+            if (v == graph_traits<Graph>::null_vertex())
+                continue;
+            dist_map[v] = numeric_limits<dist_t>::max();
+            pred_map[v] = v;
+        }
+
+        vertex_t s = vertex(source, g);
+        dist_map[s] = 0;
+
+        size_t C = max_weight + 1;
+        vector<vector<vertex_t> > buckets(C);
+        buckets[0].push_back(s);
+        size_t n_queued = 1;
+        for (size_t d_u = 0; n_queued > 0; ++d_u)
+        {
+            vector<vertex_t>& bucket = buckets[d_u % C];
+            while (!bucket.empty())
+            {
+                vertex_t u = bucket.back();
+                bucket.pop_back();
+                --n_queued;
+                if (size_t(dist_map[u]) != d_u)
+                    continue; // stale entry
+
+                if (dist_map[u] > max_d)
+                {
+                    dist_map[u] = numeric_limits<dist_t>::max();
+                    return;
+                }
+
+                typename graph_traits<Graph>::out_edge_iterator e, e_end;
+                for (tie(e, e_end) = out_edges(u, g); e != e_end; ++e)
+                {
+                    vertex_t v = target(*e, g);
+                    size_t w = get(weight, *e); // negative values wrap
+                    if (w > max_weight)
+                        throw ValueException("edge weight out of range: " +
+                                             lexical_cast<string>(w));
+                    dist_t d = dist_map[u] + w;
+                    if (d < dist_map[v])
+                    {
+                        dist_map[v] = d;
+                        pred_map[v] = u;
+                        buckets[(d_u + w) % C].push_back(v);
+                        ++n_queued;
+                    }
+                }
+            }
         }
-        catch (stop_search&) {}
     }
 };
 
+void get_dists_dial(GraphInterface& gi, size_t source, boost::any dist_map,
+                    boost::any weight, boost::any pred_map,
+                    long double max_dist, size_t max_weight)
+{
+    typedef property_map_type
+        ::apply<int64_t, GraphInterface::vertex_index_map_t>::type pred_map_t;
+    typedef property_map_types::apply<integer_types,
+                                      GraphInterface::edge_index_map_t>::type
+        integer_edge_properties;
+
+    pred_map_t pmap = any_cast<pred_map_t>(pred_map);
+
+    GILRelease gil_release;
+    run_action<>()
+        (gi, bind<void>(do_dial_search(), _1, source, gi.GetVertexIndex(),
+                        _2, pmap.get_unchecked(num_vertices(gi.GetGraph())),
+                        _3, max_dist, max_weight),
+         writable_vertex_scalar_properties(),
+         integer_edge_properties())
+        (dist_map, weight);
+}
+
 void get_dists(GraphInterface& gi, size_t source, boost::any dist_map,
                boost::any weight, boost::any pred_map, long double max_dist)
 {
@@ -161,6 +289,7 @@ void get_dists(GraphInterface& gi, size_t source, boost::any dist_map,
 
     pred_map_t pmap = any_cast<pred_map_t>(pred_map);
 
+    GILRelease gil_release;
     if (weight.empty())
     {
         run_action<>()
@@ -184,8 +313,585 @@ void get_dists(GraphInterface& gi, size_t source, boost::any dist_map,
     }
 }
 
+// distances from several sources at once, which are searched in parallel; the
+// distances are returned as a [n_sources, N] array. The search buffers are
+// allocated once per thread, and after each search only the entries it
+// touched are copied out and reset. No predecessors are recorded.
+struct do_multi_search
+{
+    template <class Graph, class VertexIndexMap, class WeightMap>
+    void operator()(const Graph& g, VertexIndexMap vertex_index,
+                    WeightMap weight, const vector<size_t>& sources,
+                    bool weighted, long double max_dist, python::object& ret)
+        const
+    {
+        typedef typename graph_traits<Graph>::vertex_descriptor vertex_t;
+        typedef typename property_traits<WeightMap>::value_type dist_t;
+        typedef unchecked_vector_property_map<dist_t, VertexIndexMap>
+            dist_map_t;
+        typedef unchecked_vector_property_map<size_t, VertexIndexMap>
+            index_in_heap_t;
+
+        const dist_t inf = numeric_limits<dist_t>::max();
+        dist_t max_d = (max_dist > 0) ? max_dist : inf;
+
+        size_t N = num_vertices(g);
+        multi_array<dist_t,2> dists(extents[sources.size()][N]);
+        fill(dists.data(), dists.data() + dists.num_elements(), inf);
+        string err;
+
+        {
+            GILRelease gil_release;
+            int i, M = sources.size();
+            #pragma omp parallel default(shared) private(i)
+            {
+                dist_map_t dist_map(vertex_index, N);
+                for (size_t j = 0; j < N; ++j)
+                    dist_map.get_storage()[j] = inf;
+                index_in_heap_t index_in_heap(vertex_index, N);
+                d_ary_heap_indirect<vertex_t, 4, index_in_heap_t, dist_map_t,
+                                    std::less<dist_t> >
+                    queue(dist_map, index_in_heap);
+                vector<vertex_t> touched;
+
+                #pragma omp for schedule(dynamic)
+                for (i = 0; i < M; ++i)
+                {
+                    vertex_t s = vertex(sources[i], g);
+                    try
+                    {
+                        if (weighted)
+                            djk_search(g, s, dist_map, queue, weight, max_d,
+                                       touched);
+                        else
+                            bfs_search(g, s, dist_map, max_d, touched);
+                    }
+                    catch (ValueException& e)
+                    {
+                        #pragma omp critical
+                        err = e.what();
+                    }
+                    while (!queue.empty())
+                        queue.pop();
+                    for (size_t j = 0; j < touched.size(); ++j)
+                    {
+                        vertex_t v = touched[j];
+                        dists[i][vertex_index[v]] = dist_map[v];
+                        dist_map[v] = inf;
+                    }
+                    touched.clear();
+                }
+            }
+        }
+        if (!err.empty())
+            throw ValueException(err);
+        ret = wrap_multi_array_owned(dists);
+    }
+
+    // breadth-first search, where the touched vertices are also the queue
+    template <class Graph, class DistMap>
+    void bfs_search(const Graph& g,
+                    typename graph_traits<Graph>::vertex_descriptor s,
+                    DistMap dist_map,
+                    typename property_traits<DistMap>::value_type max_d,
+                    vector<typename graph_traits<Graph>::vertex_descriptor>&
+                        touched) const
+    {
+        typedef typename graph_traits<Graph>::vertex_descriptor vertex_t;
+        typedef typename property_traits<DistMap>::value_type dist_t;
+        const dist_t inf = numeric_limits<dist_t>::max();
+
+        dist_map[s] = 0;
+        touched.push_back(s);
+        for (size_t pos = 0; pos < touched.size(); ++pos)
+        {
+            vertex_t u = touched[pos];
+            dist_t d = dist_map[u] + 1;
+            typename graph_traits<Graph>::out_edge_iterator e, e_end;
+            for (tie(e, e_end) = out_edges(u, g); e != e_end; ++e)
+            {
+                vertex_t v = target(*e, g);
+                if (dist_map[v] != inf)
+                    continue;
+                if (d > max_d)
+                    return;
+                dist_map[v] = d;
+                touched.push_back(v);
+            }
+        }
+    }
+
+    // same as do_djk_search, but using the given buffers
+    template <class Graph, class DistMap, class Queue, class WeightMap>
+    void djk_search(const Graph& g,
+                    typename graph_traits<Graph>::vertex_descriptor s,
+                    DistMap dist_map, Queue& queue, WeightMap weight,
+                    typename property_traits<DistMap>::value_type max_d,
+                    vector<typename graph_traits<Graph>::vertex_descriptor>&
+                        touched) const
+    {
+        typedef typename graph_traits<Graph>::vertex_descriptor vertex_t;
+        typedef typename property_traits<DistMap>::value_type dist_t;
+        const dist_t inf = numeric_limits<dist_t>::max();
+
+        dist_map[s] = 0;
+        touched.push_back(s);
+        queue.push(s);
+        while (!queue.empty())
+        {
+            vertex_t u = queue.top();
+            queue.pop();
+
+            if (dist_map[u] > max_d)
+            {
+                dist_map[u] = inf;
+                break;
+            }
+
+            typename graph_traits<Graph>::out_edge_iterator e, e_end;
+            for (tie(e, e_end) = out_edges(u, g); e != e_end; ++e)
+            {
+                if (get(weight, *e) < 0)
+                    throw ValueException("negative edge weight found");
+                vertex_t v = target(*e, g);
+                dist_t d = dist_map[u] + get(weight, *e);
+                if (d < dist_map[v])
+                {
+                    if (dist_map[v] != inf)
+                    {
+                        dist_map[v] = d;
+                        queue.update(v);
+                    }
+                    else
+                    {
+                        dist_map[v] = d;
+                        touched.push_back(v);
+                        queue.push(v);
+                    }
+                }
+            }
+        }
+    }
+};
+
+python::object get_dists_multi(GraphInterface& gi, python::object sources,
+                               boost::any weight, long double max_dist)
+{
+    typedef mpl::push_back<edge_scalar_properties, no_weight_map_t>::type
+        weight_props_t;
+
+    multi_array_ref<int64_t,1> src = get_array<int64_t,1>(sources);
+    vector<size_t> srcs(src.begin(), src.end());
+    for (size_t i = 0; i < srcs.size(); ++i)
+        if (srcs[i] >= num_vertices(gi.GetGraph()))
+            throw ValueException("invalid source vertex: " +
+                                 lexical_cast<string>(srcs[i]));
+
+    bool weighted = !weight.empty();
+    if (!weighted)
+        weight = no_weight_map_t(1);
+
+    python::object ret;
+    run_action<>()
+        (gi, bind<void>(do_multi_search(), _1, gi.GetVertexIndex(), _2,
+                        ref(srcs), weighted, max_dist, ref(ret)),
+         weight_props_t())
+        (weight);
+    return ret;
+}
+
+// stores a path either as lists of Vertex and Edge objects, or as arrays of
+// their indexes
+class path_wrap
+{
+public:
+    path_wrap(python::object gi,
+              GraphInterface::vertex_index_map_t vertex_index,
+              GraphInterface::edge_index_map_t edge_index, bool as_array,
+              python::object& ret)
+        : _gi(gi), _vertex_index(vertex_index), _edge_index(edge_index),
+          _as_array(as_array), _ret(&ret) {}
+
+    template <class Graph, class Vertex, class Edge>
+    void operator()(const Graph&, const vector<Vertex>& vs,
+                    const vector<Edge>& es) const
+    {
+        if (_as_array)
+        {
+            vector<int64_t> vidx(vs.size()), eidx(es.size());
+            for (size_t i = 0; i < vs.size(); ++i)
+                vidx[i] = _vertex_index[vs[i]];
+            for (size_t i = 0; i < es.size(); ++i)
+                eidx[i] = _edge_index[es[i]];
+            *_ret = python::make_tuple(wrap_vector_owned(vidx),
+                                       wrap_vector_owned(eidx));
+        }
+        else
+        {
+            python::list vlist, elist;
+            for (size_t i = 0; i < vs.size(); ++i)
+                vlist.append(PythonVertex(_gi, vs[i]));
+            for (size_t i = 0; i < es.size(); ++i)
+                elist.append(PythonEdge<typename Graph::orig_graph_t>(_gi,
+                                                                      es[i]));
+            *_ret = python::make_tuple(vlist, elist);
+        }
+    }
+
+private:
+    python::object _gi;
+    GraphInterface::vertex_index_map_t _vertex_index;
+    GraphInterface::edge_index_map_t _edge_index;
+    bool _as_array;
+    python::object* _ret;
+};
+
+// reconstruct the path from source to target from the predecessor map; if
+// there are parallel edges, the one with the smallest weight is chosen
+struct do_pred_path
+{
+    template <class Graph, class VertexIndexMap, class PredMap,
+              class WeightMap>
+    void operator()(const Graph& g, VertexIndexMap vertex_index,
+                    PredMap pred_map, WeightMap weight, size_t src, size_t tgt,
+                    path_wrap wrap) const
+    {
+        typedef typename graph_traits<Graph>::vertex_descriptor vertex_t;
+        typedef typename graph_traits<Graph>::edge_descriptor edge_t;
+
+        vector<vertex_t> vs;
+        vector<edge_t> es;
+        {
+            GILRelease gil_release;
+            get_path(g, vertex_index, pred_map, weight, src, tgt, vs, es);
+            reverse(vs.begin(), vs.end());
+            reverse(es.begin(), es.end());
+        }
+        wrap(g, vs, es);
+    }
+
+    template <class Graph, class VertexIndexMap, class PredMap,
+              class WeightMap>
+    void get_path(const Graph& g, VertexIndexMap vertex_index,
+                  PredMap pred_map, WeightMap weight, size_t src, size_t tgt,
+                  vector<typename graph_traits<Graph>::vertex_descriptor>& vs,
+                  vector<typename graph_traits<Graph>::edge_descriptor>& es)
+        const
+    {
+        typedef typename graph_traits<Graph>::vertex_descriptor vertex_t;
+        typedef typename graph_traits<Graph>::edge_descriptor edge_t;
+        typedef typename property_traits<WeightMap>::value_type weight_t;
+
+        // the lists are left empty if the target was not reached
+        vertex_t v = vertex(tgt, g);
+        if (tgt != src && size_t(pred_map[v]) == tgt)
+            return;
+        vs.push_back(v);
+        while (size_t(vertex_index[v]) != src)
+        {
+            size_t p_i = pred_map[v];
+            if (p_i >= num_vertices(g) || p_i == size_t(vertex_index[v]) ||
+                vs.size() > num_vertices(g))
+                throw ValueException("invalid predecessor map");
+            vertex_t p = vertex(p_i, g);
+
+            edge_t pe;
+            weight_t min_w = weight_t();
+            bool found = false;
+            typename graph_traits<Graph>::out_edge_iterator e, e_end;
+            for (tie(e, e_end) = out_edges(p, g); e != e_end; ++e)
+            {
+                if (target(*e, g) != v)
+                    continue;
+                if (!found || get(weight, *e) < min_w)
+                {
+                    pe = *e;
+                    min_w = get(weight, *e);
+                    found = true;
+                }
+                if (is_same<WeightMap, no_weight_map_t>::value)
+                    break; // all parallel edges are equally good
+            }
+            if (!found)
+                throw ValueException("invalid predecessor map");
+
+            es.push_back(pe);
+            vs.push_back(p);
+            v = p;
+        }
+    }
+};
+
+python::object get_pred_path(GraphInterface& gi, python::object gref,
+                             size_t source, size_t target, boost::any pred_map,
+                             boost::any weight, bool as_array)
+{
+    typedef DynamicPropertyMapWrap<int64_t,GraphInterface::vertex_t> pred_t;
+    typedef mpl::push_back<edge_scalar_properties, no_weight_map_t>::type
+        weight_props_t;
+
+    if (source >= num_vertices(gi.GetGraph()) ||
+        target >= num_vertices(gi.GetGraph()))
+        throw ValueException("invalid source or target vertex");
+
+    if (weight.empty())
+        weight = no_weight_map_t(1);
+
+    python::object ret;
+    run_action<graph_tool::detail::all_graph_views, mpl::true_>()
+        (gi, bind<void>(do_pred_path(), _1, gi.GetVertexIndex(),
+                        pred_t(pred_map, vertex_scalar_properties()), _2,
+                        source, target,
+                        path_wrap(gref, gi.GetVertexIndex(), gi.GetEdgeIndex(),
+                                  as_array, ret)),
+         weight_props_t())
+        (weight);
+    return ret;
+}
+
+// FIFO queue with the same interface as the indexed heap, which is used
+// instead of it for unweighted graphs, since in this case the vertices are
+// already reached in the order of their distances
+template <class Vertex>
+class fifo_queue
+{
+public:
+    template <class DistMap, class IndexInHeap>
+    fifo_queue(DistMap, IndexInHeap): _pos(0) {}
+
+    void push(const Vertex& v) { _queue.push_back(v); }
+    void update(const Vertex&) {}
+    const Vertex& top() const { return _queue[_pos]; }
+    void pop() { ++_pos; }
+    bool empty() const { return _pos == _queue.size(); }
+
+private:
+    vector<Vertex> _queue;
+    size_t _pos;
+};
+
+// bidirectional Dijkstra search for the shortest path between a single pair
+// of vertices: a forward search from the source and a backward search from
+// the target are alternated, always advancing the one with the closest
+// frontier, until the sum of both frontier distances is no smaller than the
+// best path found so far, i.e. when the searched balls meet.
+template <class Graph, class VertexIndexMap, class WeightMap>
+class bidirectional_search
+{
+public:
+    typedef typename graph_traits<Graph>::vertex_descriptor vertex_t;
+    typedef typename graph_traits<Graph>::edge_descriptor edge_t;
+    typedef typename property_traits<WeightMap>::value_type weight_t;
+    typedef typename mpl::if_<is_floating_point<weight_t>, weight_t,
+                              int64_t>::type dist_t;
+    typedef unchecked_vector_property_map<dist_t, VertexIndexMap> dist_map_t;
+    typedef unchecked_vector_property_map<size_t, VertexIndexMap>
+        index_in_heap_t;
+    typedef typename mpl::if_<is_same<WeightMap, no_weight_map_t>,
+                              fifo_queue<vertex_t>,
+                              d_ary_heap_indirect<vertex_t, 4, index_in_heap_t,
+                                                  dist_map_t,
+                                                  std::less<dist_t> > >::type
+        queue_t;
+
+    // the state of the search in one direction
+    struct search_t
+    {
+        search_t(VertexIndexMap vertex_index, size_t N)
+            : dist(vertex_index, N), index_in_heap(vertex_index, N),
+              pred(N), pred_edge(N), queue(dist, index_in_heap) {}
+
+        dist_map_t dist;
+        index_in_heap_t index_in_heap;
+        vector<vertex_t> pred;
+        vector<edge_t> pred_edge;
+        queue_t queue;
+    };
+
+    bidirectional_search(const Graph& g, VertexIndexMap vertex_index,
+                         WeightMap weight)
+        : _g(g), _vertex_index(vertex_index), _weight(weight),
+          _fwd(vertex_index, num_vertices(g)),
+          _bwd(vertex_index, num_vertices(g)),
+          _mu(numeric_limits<dist_t>::max()),
+          _meet(graph_traits<Graph>::null_vertex()) {}
+
+    // returns false if target is not reachable from source; otherwise the
+    // vertices and edges of the path are stored in vlist and elist
+    bool operator()(vertex_t s, vertex_t t, vector<vertex_t>& vlist,
+                    vector<edge_t>& elist)
+    {
+        int i, N = num_vertices(_g);
+        #pragma omp parallel for default(shared) private(i) schedule(dynamic)
+        for (i = 0; i < N; ++i)
+        {
+            _fwd.dist[i] = numeric_limits<dist_t>::max();
+            _bwd.dist[i] = numeric_limits<dist_t>::max();
+        }
+
+        _fwd.dist[s] = 0;
+        _fwd.queue.push(s);
+        _bwd.dist[t] = 0;
+        _bwd.queue.push(t);
+        if (s == t)
+        {
+            _mu = 0;
+            _meet = s;
+        }
+
+        while (!_fwd.queue.empty() && !_bwd.queue.empty())
+        {
+            dist_t d_f = _fwd.dist[_fwd.queue.top()];
+            dist_t d_b = _bwd.dist[_bwd.queue.top()];
+            if (_mu != numeric_limits<dist_t>::max() && d_f + d_b >= _mu)
+                break;
+
+            if (d_f <= d_b)
+            {
+                vertex_t u = _fwd.queue.top();
+                _fwd.queue.pop();
+                typename graph_traits<Graph>::out_edge_iterator e, e_end;
+                for (tie(e, e_end) = out_edges(u, _g); e != e_end; ++e)
+                    relax(u, target(*e, _g), *e, _fwd, _bwd);
+            }
+            else
+            {
+                vertex_t u = _bwd.queue.top();
+                _bwd.queue.pop();
+                relax_backward(u, typename graph_tool::is_directed::apply<Graph>
+                                      ::type());
+            }
+        }
+
+        if (_meet == graph_traits<Graph>::null_vertex())
+            return false;
+
+        for (vertex_t v = _meet; v != s; v = _fwd.pred[_vertex_index[v]])
+        {
+            vlist.push_back(v);
+            elist.push_back(_fwd.pred_edge[_vertex_index[v]]);
+        }
+        vlist.push_back(s);
+        reverse(vlist.begin(), vlist.end());
+        reverse(elist.begin(), elist.end());
+        for (vertex_t v = _meet; v != t; v = _bwd.pred[_vertex_index[v]])
+        {
+            elist.push_back(_bwd.pred_edge[_vertex_index[v]]);
+            vlist.push_back(_bwd.pred[_vertex_index[v]]);
+        }
+        return true;
+    }
+
+private:
+    // the backward search follows the in-edges of directed graphs
+    void relax_backward(vertex_t u, mpl::true_)
+    {
+        typename graph_traits<Graph>::in_edge_iterator e, e_end;
+        for (tie(e, e_end) = in_edges(u, _g); e != e_end; ++e)
+            relax(u, source(*e, _g), *e, _bwd, _fwd);
+    }
+
+    void relax_backward(vertex_t u, mpl::false_)
+    {
+        typename graph_traits<Graph>::out_edge_iterator e, e_end;
+        for (tie(e, e_end) = out_edges(u, _g); e != e_end; ++e)
+            relax(u, target(*e, _g), *e, _bwd, _fwd);
+    }
+
+    void relax(vertex_t u, vertex_t v, const edge_t& e, search_t& search,
+               search_t& other)
+    {
+        if (get(_weight, e) < 0)
+            throw ValueException("negative edge weight found");
+        dist_t d = search.dist[u] + dist_t(get(_weight, e));
+        if (d < search.dist[v])
+        {
+            bool queued = search.dist[v] != numeric_limits<dist_t>::max();
+            search.dist[v] = d;
+            search.pred[_vertex_index[v]] = u;
+            search.pred_edge[_vertex_index[v]] = e;
+            if (queued)
+                search.queue.update(v);
+            else
+                search.queue.push(v);
+        }
+        if (other.dist[v] != numeric_limits<dist_t>::max() &&
+            search.dist[v] + other.dist[v] < _mu)
+        {
+            _mu = search.dist[v] + other.dist[v];
+            _meet = v;
+        }
+    }
+
+    const Graph& _g;
+    VertexIndexMap _vertex_index;
+    WeightMap _weight;
+    search_t _fwd, _bwd;
+    dist_t _mu;
+    vertex_t _meet;
+};
+
+struct do_pair_path
+{
+    template <class Graph, class VertexIndexMap, class WeightMap>
+    void operator()(const Graph& g, VertexIndexMap vertex_index,
+                    WeightMap weight, size_t src, size_t tgt, path_wrap wrap)
+        const
+    {
+        typedef typename graph_traits<Graph>::vertex_descriptor vertex_t;
+        typedef typename graph_traits<Graph>::edge_descriptor edge_t;
+
+        // the lists are left empty if there is no path
+        vector<vertex_t> vs;
+        vector<edge_t> es;
+        {
+            GILRelease gil_release;
+            if (src == tgt)
+            {
+                vs.push_back(vertex(src, g));
+            }
+            else
+            {
+                bidirectional_search<Graph, VertexIndexMap, WeightMap>
+                    search(g, vertex_index, weight);
+                search(vertex(src, g), vertex(tgt, g), vs, es);
+            }
+        }
+        wrap(g, vs, es);
+    }
+};
+
+python::object get_pair_path(GraphInterface& gi, python::object gref,
+                             size_t source, size_t target, boost::any weight,
+                             bool as_array)
+{
+    typedef mpl::push_back<edge_scalar_properties, no_weight_map_t>::type
+        weight_props_t;
+
+    if (source >= num_vertices(gi.GetGraph()) ||
+        target >= num_vertices(gi.GetGraph()))
+        throw ValueException("invalid source or target vertex");
+
+    if (weight.empty())
+        weight = no_weight_map_t(1);
+
+    python::object ret;
+    run_action<graph_tool::detail::all_graph_views, mpl::true_>()
+        (gi, bind<void>(do_pair_path(), _1, gi.GetVertexIndex(), _2, source,
+                        target,
+                        path_wrap(gref, gi.GetVertexIndex(), gi.GetEdgeIndex(),
+                                  as_array, ret)),
+         weight_props_t())
+        (weight);
+    return ret;
+}
+
 void export_dists()
 {
     python::def("get_dists", &get_dists);
+    python::def("get_dists_dial", &get_dists_dial);
+    python::def("get_dists_multi", &get_dists_multi);
+    python::def("get_pred_path", &get_pred_path);
+    python::def("get_pair_path", &get_pair_path);
 };
 
@@ -0,0 +1,61 @@
+// graph-tool -- a general graph modification and manipulation thingy
+//
+// Copyright (C) 2007-2011 Tiago de Paula Peixoto <tiago@skewed.de>
+//
+// This program is free software; you can redistribute it and/or
+// modify it under the terms of the GNU General Public License
+// as published by the Free Software Foundation; either version 3
+// of the License, or (at your option) any later version.
+//
+// This program is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+#include "graph_filtering.hh"
+#include "graph.hh"
+#include "graph_properties.hh"
+
+#include "numpy_bind.hh"
+
+using namespace std;
+using namespace boost;
+using namespace graph_tool;
+
+// the edges of the graph as a [E, 3] array, where each row contains the source
+// and target vertex indexes, and the edge index
+struct get_edge_array
+{
+    template <class Graph, class VertexIndex, class EdgeIndex>
+    void operator()(const Graph& g, VertexIndex vertex_index,
+                    EdgeIndex edge_index, python::object& ret) const
+    {
+        size_t E = 0;
+        typename graph_traits<Graph>::edge_iterator e, e_end;
+        for (tie(e, e_end) = edges(g); e != e_end; ++e)
+            ++E;
+
+        multi_array<int64_t,2> edge_array(extents[E][3]);
+        size_t i = 0;
+        for (tie(e, e_end) = edges(g); e != e_end; ++e)
+        {
+            edge_array[i][0] = vertex_index[source(*e, g)];
+            edge_array[i][1] = vertex_index[target(*e, g)];
+            edge_array[i][2] = edge_index[*e];
+            ++i;
+        }
+        ret = wrap_multi_array_owned(edge_array);
+    }
+};
+
+python::object get_edges(GraphInterface& gi)
+{
+    python::object ret;
+    run_action<>()
+        (gi, bind<void>(get_edge_array(), _1, gi.GetVertexIndex(),
+                        gi.GetEdgeIndex(), ref(ret)))();
+    return ret;
+}
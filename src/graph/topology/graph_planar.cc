@@ -54,31 +54,33 @@ struct get_planar_embedding
                     EmbedMap embed_map, KurMap kur_map, bool& is_planar) const
     {
         edge_inserter<KurMap> kur_insert(kur_map);
-        unchecked_vector_property_map
-            <vector<typename graph_traits<Graph>::edge_descriptor>, VertexIndex>
-            embedding(vertex_index, num_vertices(g));
+        typename embedding_t<Graph, VertexIndex>::type
+            embedding = get_embedding(g, vertex_index);
         is_planar = boyer_myrvold_planarity_test
             (boyer_myrvold_params::graph = g,
              boyer_myrvold_params::edge_index_map = edge_index,
              boyer_myrvold_params::embedding = embedding,
              boyer_myrvold_params::kuratowski_subgraph = kur_insert);
+        copy_embedding(g, edge_index, embedding, embed_map);
+    }
 
-        int i, N = num_vertices(g);
-        #pragma omp parallel for default(shared) private(i) schedule(dynamic)
-        for (i = 0; i < N; ++i)
-        {
-            typename graph_traits<Graph>::vertex_descriptor v = vertex(i, g);
-            if (v == graph_traits<Graph>::null_vertex())
-                continue;
-            embed_map[v].resize(embedding[v].size());
-            for (size_t j = 0; j < embedding[v].size(); ++j)
-                embed_map[v][j] = edge_index[embedding[v][j]];
-        }
+    template <class Graph, class VertexIndex, class EdgeIndex, class EmbedMap>
+    void operator()(Graph& g, VertexIndex vertex_index, EdgeIndex edge_index,
+                    EmbedMap embed_map, dummy_property_map,
+                    bool& is_planar) const
+    {
+        typename embedding_t<Graph, VertexIndex>::type
+            embedding = get_embedding(g, vertex_index);
+        is_planar = boyer_myrvold_planarity_test
+            (boyer_myrvold_params::graph = g,
+             boyer_myrvold_params::edge_index_map = edge_index,
+             boyer_myrvold_params::embedding = embedding);
+        copy_embedding(g, edge_index, embedding, embed_map);
     }
 
     template <class Graph, class VertexIndex, class EdgeIndex, class KurMap>
-    void operator()(Graph& g, VertexIndex vertex_index, EdgeIndex edge_index,
-                    dummy_property_map embed_map, KurMap kur_map,
+    void operator()(Graph& g, VertexIndex, EdgeIndex edge_index,
+                    dummy_property_map, KurMap kur_map,
                     bool& is_planar) const
     {
         edge_inserter<KurMap> kur_insert(kur_map);
@@ -88,6 +90,57 @@ struct get_planar_embedding
              boyer_myrvold_params::kuratowski_subgraph = kur_insert);
     }
 
+    // if neither the embedding nor the Kuratowski subgraph are requested, only
+    // the test itself is performed
+    template <class Graph, class VertexIndex, class EdgeIndex>
+    void operator()(Graph& g, VertexIndex, EdgeIndex edge_index,
+                    dummy_property_map, dummy_property_map,
+                    bool& is_planar) const
+    {
+        is_planar = boyer_myrvold_planarity_test
+            (boyer_myrvold_params::graph = g,
+             boyer_myrvold_params::edge_index_map = edge_index);
+    }
+
+    template <class Graph, class VertexIndex>
+    struct embedding_t
+    {
+        typedef unchecked_vector_property_map
+            <vector<typename graph_traits<Graph>::edge_descriptor>,
+             VertexIndex> type;
+    };
+
+    template <class Graph, class VertexIndex>
+    typename embedding_t<Graph, VertexIndex>::type
+    get_embedding(Graph& g, VertexIndex vertex_index) const
+    {
+        typename embedding_t<Graph, VertexIndex>::type
+            embedding(vertex_index, num_vertices(g));
+
+        // each vertex's edge list in the embedding will have exactly its
+        // degree, so it can be allocated at once
+        typename graph_traits<Graph>::vertex_iterator v, v_end;
+        for (tie(v, v_end) = vertices(g); v != v_end; ++v)
+            embedding[*v].reserve(out_degree(*v, g));
+        return embedding;
+    }
+
+    template <class Graph, class EdgeIndex, class Embedding, class EmbedMap>
+    void copy_embedding(Graph& g, EdgeIndex edge_index, Embedding embedding,
+                        EmbedMap embed_map) const
+    {
+        int i, N = num_vertices(g);
+        #pragma omp parallel for default(shared) private(i) schedule(dynamic)
+        for (i = 0; i < N; ++i)
+        {
+            typename graph_traits<Graph>::vertex_descriptor v = vertex(i, g);
+            if (v == graph_traits<Graph>::null_vertex())
+                continue;
+            embed_map[v].resize(embedding[v].size());
+            for (size_t j = 0; j < embedding[v].size(); ++j)
+                embed_map[v][j] = edge_index[embedding[v][j]];
+        }
+    }
 };
 
 bool is_planar(GraphInterface& gi, boost::any embed_map, boost::any kur_map)
@@ -104,6 +157,7 @@ bool is_planar(GraphInterface& gi, boost::any embed_map, boost::any kur_map)
     typedef mpl::push_back<vertex_scalar_vector_properties,
                            dummy_property_map>::type vertex_map_types;
 
+    GILRelease gil_release;
     run_action<graph_tool::detail::never_directed>()
         (gi, bind<void>(get_planar_embedding(), _1, gi.GetVertexIndex(),
                         gi.GetEdgeIndex(), _2, _3, ref(is_planar)),
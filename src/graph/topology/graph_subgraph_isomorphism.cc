@@ -18,6 +18,12 @@
 #include "graph.hh"
 #include "graph_filtering.hh"
 
+#if (GCC_VERSION >= 40400)
+#   include <tr1/unordered_set>
+#else
+#   include <boost/tr1/unordered_set.hpp>
+#endif
+
 #include <graph_subgraph_isomorphism.hh>
 #include <graph_python_interface.hh>
 
@@ -35,12 +41,10 @@ public:
     typedef typename property_traits<Label1>::value_type value_type1;
     typedef typename property_traits<Label2>::value_type value_type2;
 
+    // the degrees are already compared by subgraph_isomorphism()
     bool operator()(typename graph_traits<Graph1>::vertex_descriptor v1,
                     typename graph_traits<Graph1>::vertex_descriptor v2) const
     {
-        if (in_degreeS()(v2, _g2) < in_degreeS()(v1, _g1) ||
-            out_degree(v2, _g2) < out_degree(v1, _g1))
-            return false;
         return _label1[v1] == _label2[v2];
     }
 
@@ -239,3 +243,82 @@ void subgraph_isomorphism(GraphInterface& gi1, GraphInterface& gi2,
         emapping.append(PythonPropertyMap<emap_t>(ep.get_checked()));
     }
 }
+
+// mark the vertices and edges of g which correspond to the subgraph sub,
+// given the mapping of its vertices (vmap) and edges (emap) to the vertex and
+// edge indexes of g
+struct get_mark_subgraph
+{
+    template <class Graph1, class Graph2, class VertexMap, class EdgeMap,
+              class EdgeIndexMap, class VertexMask, class EdgeMask>
+    void operator()(const Graph1& sub, const Graph2* gp, VertexMap vmap,
+                    EdgeMap emap, EdgeIndexMap edge_index, VertexMask vmask,
+                    EdgeMask emask) const
+    {
+        typedef typename property_traits<EdgeMap>::key_type emap_key_t;
+        const Graph2& g = *gp;
+
+        tr1::unordered_set<size_t> wanted;
+        typename graph_traits<Graph1>::vertex_iterator v, v_end;
+        for (tie(v, v_end) = vertices(sub); v != v_end; ++v)
+        {
+            typename graph_traits<Graph2>::vertex_descriptor w =
+                vertex(get(vmap, *v), g);
+            if (w == graph_traits<Graph2>::null_vertex())
+                continue;
+            vmask[w] = true;
+
+            // the images of the out-edges of v are kept in a hash set, so
+            // that each out-edge of w is matched in constant time
+            wanted.clear();
+            typename graph_traits<Graph1>::out_edge_iterator ev, ev_end;
+            for (tie(ev, ev_end) = out_edges(*v, sub); ev != ev_end; ++ev)
+                wanted.insert(get(emap, emap_key_t(*ev)));
+
+            typename graph_traits<Graph2>::out_edge_iterator ew, ew_end;
+            for (tie(ew, ew_end) = out_edges(w, g); ew != ew_end; ++ew)
+                if (wanted.find(edge_index[*ew]) != wanted.end())
+                    emask[*ew] = true;
+        }
+    }
+};
+
+struct graph_view_pointers:
+    mpl::transform<graph_tool::detail::all_graph_views,
+                   mpl::quote1<add_pointer> >::type {};
+
+void mark_subgraph(GraphInterface& gi1, GraphInterface& gi2,
+                   boost::any vmap, boost::any emap, boost::any vmask,
+                   boost::any emask)
+{
+    typedef DynamicPropertyMapWrap<int64_t,GraphInterface::vertex_t>
+        vmap_t;
+    typedef DynamicPropertyMapWrap<int64_t,GraphInterface::edge_t>
+        emap_t;
+    typedef property_map_type
+        ::apply<uint8_t, GraphInterface::vertex_index_map_t>::type vmask_t;
+    typedef property_map_type
+        ::apply<uint8_t, GraphInterface::edge_index_map_t>::type emask_t;
+
+    vmask_t vm;
+    emask_t em;
+    try
+    {
+        vm = any_cast<vmask_t>(vmask);
+        em = any_cast<emask_t>(emask);
+    }
+    catch (bad_any_cast&)
+    {
+        throw ValueException("vertex and edge masks must be of type bool");
+    }
+
+    run_action<>()
+        (gi1, bind<void>(get_mark_subgraph(), _1, _2,
+                         vmap_t(vmap, vertex_scalar_properties()),
+                         emap_t(emap, edge_scalar_properties()),
+                         gi2.GetEdgeIndex(),
+                         vm.get_unchecked(num_vertices(gi2.GetGraph())),
+                         em.get_unchecked(gi2.GetMaxEdgeIndex() + 1)),
+         graph_view_pointers())
+        (gi2.GetGraphView());
+}
@@ -145,6 +145,22 @@ struct check_adjacency
 };
 
 
+// in- and out-degrees of all vertices, indexed by vertex index
+template <class Graph>
+void get_degrees(const Graph& g, vector<size_t>& k_in, vector<size_t>& k_out)
+{
+    k_in.resize(num_vertices(g), 0);
+    k_out.resize(num_vertices(g), 0);
+    for (size_t i = 0; i < num_vertices(g); ++i)
+    {
+        typename graph_traits<Graph>::vertex_descriptor v = vertex(i, g);
+        if (v == graph_traits<Graph>::null_vertex())
+            continue;
+        k_in[i] = graph_tool::in_degreeS()(v, g);
+        k_out[i] = out_degree(v, g);
+    }
+}
+
 template <class Graph1, class Graph2, class EdgeLabelling>
 bool refine_check(const Graph1& sub, const Graph2& g, matrix_t& M, size_t count,
                   tr1::unordered_set<size_t>& already_mapped,
@@ -312,6 +328,14 @@ void subgraph_isomorphism(const Graph1& sub, const Graph2& g,
     for (size_t j = 0; j < num_vertices(g); ++j)
         vindex[vlist[j]] = j;
 
+    // a vertex of g can only be a candidate for a vertex of sub if neither its
+    // in- nor its out-degree is smaller. The degrees are computed only once
+    // (this is O(E) for filtered graphs), and the candidates are pruned with
+    // them before the vertex labelling is called
+    vector<size_t> k_in1, k_out1, k_in2, k_out2;
+    detail::get_degrees(sub, k_in1, k_out1);
+    detail::get_degrees(g, k_in2, k_out2);
+
     bool abort = false;
     int i, N = num_vertices(sub);
     #pragma omp parallel for default(shared) private(i) schedule(dynamic)
@@ -324,6 +348,8 @@ void subgraph_isomorphism(const Graph1& sub, const Graph2& g,
         {
             if (vertex(vlist[j], g) == graph_traits<Graph1>::null_vertex())
                 continue;
+            if (k_in2[vlist[j]] < k_in1[i] || k_out2[vlist[j]] < k_out1[i])
+                continue;
             if (vertex_labelling(vertex(i, sub), vertex(vlist[j], g)))
                 M0[i].insert(j);
         }
@@ -332,7 +358,54 @@ void subgraph_isomorphism(const Graph1& sub, const Graph2& g,
     }
     if (abort)
         return;
-    detail::find_mappings(sub, g, M0, F, edge_labelling, vlist, vindex, max_n);
+
+    size_t root = 0;
+    for (root = 0; root < num_vertices(sub); ++root)
+        if (vertex(root, sub) != graph_traits<Graph1>::null_vertex())
+            break;
+    if (root == num_vertices(sub))
+    {
+        detail::find_mappings(sub, g, M0, F, edge_labelling, vlist, vindex,
+                              max_n);
+        return;
+    }
+
+    // the search trees rooted at each candidate of the first vertex of sub
+    // are independent, and are explored in parallel. The mappings of each
+    // tree are kept separately, and merged in the same order as the serial
+    // search would have found them
+    vector<size_t> roots(M0[root].begin(), M0[root].end());
+    vector<vector<Mapping> > FF(roots.size());
+    size_t n_found = 0;
+    int r, NR = roots.size();
+    #pragma omp parallel for default(shared) private(r) schedule(dynamic, 1)
+    for (r = 0; r < NR; ++r)
+    {
+        // the counter is only read and updated inside the same critical
+        // section ('omp atomic read' requires OpenMP 3.1)
+        size_t found;
+        #pragma omp critical (subgraph_isomorphism_n_found)
+        found = n_found;
+        if (max_n > 0 && found >= max_n)
+            continue;
+        detail::matrix_t M(M0);
+        M[root].clear();
+        M[root].insert(roots[r]);
+        detail::find_mappings(sub, g, M, FF[r], edge_labelling, vlist, vindex,
+                              max_n);
+        #pragma omp critical (subgraph_isomorphism_n_found)
+        n_found += FF[r].size();
+    }
+
+    for (size_t j = 0; j < FF.size(); ++j)
+    {
+        for (size_t k = 0; k < FF[j].size(); ++k)
+        {
+            if (max_n > 0 && F.size() >= max_n)
+                return;
+            F.push_back(FF[j][k]);
+        }
+    }
 }
 
 }  // namespace boost
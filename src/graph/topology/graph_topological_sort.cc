@@ -21,6 +21,8 @@
 
 #include <boost/graph/topological_sort.hpp>
 
+#include "numpy_bind.hh"
+
 using namespace std;
 using namespace boost;
 using namespace graph_tool;
@@ -35,8 +37,11 @@ struct get_topological_sort
     }
 };
 
-void topological_sort(GraphInterface& gi, vector<int32_t>& sort)
+// the sort order is returned directly as a numpy array, instead of a
+// Vector_int32_t which would need to be converted element by element
+python::object topological_sort(GraphInterface& gi)
 {
+    vector<int32_t> sort;
     try
     {
         run_action<>()
@@ -46,4 +51,5 @@ void topological_sort(GraphInterface& gi, vector<int32_t>& sort)
     {
         throw ValueException("graph is not a directed acylic graph (DAG).");
     }
+    return wrap_vector_owned(sort);
 }
@@ -28,7 +28,8 @@ void get_kruskal_spanning_tree(GraphInterface& gi, boost::any weight_map,
                                boost::any tree_map);
 void get_prim_spanning_tree(GraphInterface& gi, size_t root,
                             boost::any weight_map, boost::any tree_map);
-void topological_sort(GraphInterface& gi, vector<int32_t>& sort);
+python::object topological_sort(GraphInterface& gi);
+python::object get_edges(GraphInterface& gi);
 void dominator_tree(GraphInterface& gi, size_t entry, boost::any pred_map);
 void transitive_closure(GraphInterface& gi, GraphInterface& tcgi);
 bool is_planar(GraphInterface& gi, boost::any embed_map, boost::any kur_map);
@@ -37,6 +38,9 @@ void subgraph_isomorphism(GraphInterface& gi1, GraphInterface& gi2,
                           boost::any edge_label1, boost::any edge_label2,
                           python::list vmapping, python::list emapping,
                           size_t n_max, size_t seed);
+void mark_subgraph(GraphInterface& gi1, GraphInterface& gi2,
+                   boost::any vmap, boost::any emap, boost::any vmask,
+                   boost::any emask);
 
 void export_components();
 void export_similarity();
@@ -47,9 +51,11 @@ BOOST_PYTHON_MODULE(libgraph_tool_topology)
 {
     def("check_isomorphism", &check_isomorphism);
     def("subgraph_isomorphism", &subgraph_isomorphism);
+    def("mark_subgraph", &mark_subgraph);
     def("get_kruskal_spanning_tree", &get_kruskal_spanning_tree);
     def("get_prim_spanning_tree", &get_prim_spanning_tree);
     def("topological_sort", &topological_sort);
+    def("get_edges", &get_edges);
     def("dominator_tree", &dominator_tree);
     def("transitive_closure", &transitive_closure);
     def("is_planar", &is_planar);
@@ -33,6 +33,8 @@ Summary
 
    community_structure
    modularity
+   ModularityContext
+   modularity_batch
    condensation_graph
 
 Contents
@@ -40,18 +42,48 @@ Contents
 """
 
 from .. dl_import import dl_import
-dl_import("import libgraph_tool_community")
-
-from .. import _degree, _prop, Graph, GraphView, libcore
-import random
-import sys
-
-__all__ = ["community_structure", "modularity", "condensation_graph"]
+import warnings
+try:
+    dl_import("import libgraph_tool_community")
+except ImportError:
+    libgraph_tool_community = None
+    warnings.warn("error importing libgraph_tool_community module... " + \
+                  "only community_structure() with method='louvain' will " + \
+                  "work.", ImportWarning)
+
+from .. import _degree, _prop, Graph, GraphView, PropertyMap, libcore
+from . import _louvain
+from multiprocessing.pool import ThreadPool
+import os
+import struct
+import numpy
+
+__all__ = ["community_structure", "modularity", "ModularityContext",
+           "modularity_batch", "condensation_graph"]
+
+
+def _vprop(g, prop):
+    """Same as _prop("v", g, prop), but with a shortcut for vertex property
+    maps, which avoids the internal name lookup. If prop is an array, an
+    integer vertex property map with its values is used."""
+    if isinstance(prop, PropertyMap) and prop.key_type() == "v":
+        return prop._PropertyMap__map.get_map()
+    if isinstance(prop, numpy.ndarray):
+        if prop.dtype.itemsize > 4:
+            pmap = g.new_vertex_property("int64_t")
+        else:
+            pmap = g.new_vertex_property("int32_t")
+        pmap.a = prop
+        return pmap._PropertyMap__map.get_map()
+    return _prop("v", g, prop)
 
 
 def community_structure(g, n_iter, n_spins, gamma=1.0, corr="erdos",
                         spins=None, weight=None, t_range=(100.0, 0.01),
-                        verbose=False, history_file=None):
+                        verbose=False, history_file=None,
+                        method="annealing", n_replicas=1, n_jobs=None,
+                        patience=None, eval_every=100, n_threads=None,
+                        as_array=False):
     r"""
     Obtain the community structure for the given graph, using a Potts model approach.
 
@@ -60,17 +92,21 @@ def community_structure(g, n_iter, n_spins, gamma=1.0, corr="erdos",
     g :  :class:`~graph_tool.Graph`
         Graph to be used.
     n_iter : int
-        Number of iterations.
+        Number of iterations. If ``method == "louvain"``, this is the maximum
+        number of sweeps of the local-move phase at each level (if zero, there
+        is no limit).
     n_spins : int
-        Number of maximum spins to be used.
+        Number of maximum spins to be used. This is ignored if
+        ``method == "louvain"``.
     gamma : float (optional, default: 1.0)
         The :math:`\gamma` parameter of the hamiltonian.
     corr : string (optional, default: "erdos")
         Type of correlation to be assumed: Either "erdos", "uncorrelated" and
         "correlated".
     spins : :class:`~graph_tool.PropertyMap`
-        Vertex property maps to store the spin variables. If this is specified,
-        the values will not be initialized to a random value.
+        Vertex property maps to store the spin variables. Its values are always
+        overwritten, since the spins are initialized at random (or to one
+        community per vertex, if ``method == "louvain"``).
     weight : :class:`~graph_tool.PropertyMap` (optional, default: None)
         Edge property map with the optional edge weights.
     t_range : tuple of floats (optional, default: (100.0, 0.01))
@@ -79,11 +115,44 @@ def community_structure(g, n_iter, n_spins, gamma=1.0, corr="erdos",
         Display verbose information.
     history_file : string (optional, default: None)
         History file to keep information about the simulated annealing.
+    method : string (optional, default: "annealing")
+        Optimization method: Either "annealing", which uses simulated annealing,
+        or "louvain", which uses the greedy multi-level method of
+        [blondel-fast-2008]_. The latter is much faster, but only supports the
+        "erdos" and "uncorrelated" null models, and ignores `n_spins`,
+        `t_range` and `history_file`. This is the only method available if the
+        compiled ``libgraph_tool_community`` module is missing, in which case a
+        Python implementation is used (just-in-time compiled, if `numba` is
+        installed).
+    n_replicas : int (optional, default: 1)
+        Number of independent runs of the algorithm, with different random
+        seeds. If larger than one, the partition with the largest modularity is
+        returned.
+    n_jobs : int (optional, default: None)
+        Number of replicas which are run simultaneously, in separate threads. If
+        not given, the number of CPUs is used.
+    patience : int (optional, default: None)
+        If given, the modularity of the current partition is computed every
+        `eval_every` iterations of the simulated annealing, and the algorithm
+        stops if it does not improve after `patience` consecutive evaluations.
+        The partition with the largest modularity encountered is returned. This
+        is ignored if ``method == "louvain"``.
+    eval_every : int (optional, default: 100)
+        Number of iterations between evaluations of the modularity, if
+        `patience` is given.
+    n_threads : int (optional, default: None)
+        Number of OpenMP threads used by the simulated annealing. If not given,
+        the OpenMP default is used. This has no effect if OpenMP was not enabled
+        during compilation.
+    as_array : bool (optional, default: False)
+        If ``True``, the array of spin values (i.e. the ``a`` attribute of the
+        property map) is returned, instead of the property map itself.
 
     Returns
     -------
-    spins : :class:`~graph_tool.PropertyMap`
-        Vertex property map with the spin values.
+    spins : :class:`~graph_tool.PropertyMap` or :class:`~numpy.ndarray`
+        Vertex property map with the spin values (or its array, if `as_array`
+        is ``True``).
 
     See Also
     --------
@@ -134,7 +203,27 @@ def community_structure(g, n_iter, n_spins, gamma=1.0, corr="erdos",
         continue a previous run, if you saved the graph, by properly setting
         `t_range` value, and using the same `spin` property.
 
-    If enabled during compilation, this algorithm runs in parallel.
+    If ``method == "louvain"``, the same hamiltonian is minimized with the greedy
+    multi-level procedure of [blondel-fast-2008]_: each vertex is moved to the
+    neighbouring community which decreases the energy the most, until no more
+    moves are possible, after which the communities are contracted into single
+    vertices and the process is repeated, until no further improvement is
+    obtained. This typically takes time :math:`O(E)` per level, and is much
+    faster than simulated annealing, although it is not guaranteed to find the
+    ground state. Only the "erdos" and "uncorrelated" null models are supported
+    by this method.
+
+    Since the results of both methods depend on the random seed, it is often
+    advantageous to run the algorithm several times and keep the best result,
+    which can be done with the `n_replicas` option. The replicas run
+    concurrently in different threads, since the python GIL is released during
+    the computation. If `history_file` is given, the history of each replica is
+    saved in a separate file, with the replica number appended to its name.
+
+    If enabled during compilation, the simulated annealing runs in parallel:
+    The vertices are greedily colored so that no two neighbours have the same
+    color, and the spins of the vertices with the same color are updated
+    simultaneously.
 
     Examples
     --------
@@ -196,25 +285,92 @@ def community_structure(g, n_iter, n_spins, gamma=1.0, corr="erdos",
     .. [newman-modularity-2006] M. E. J. Newman, "Modularity and community
        structure in networks", Proc. Natl. Acad. Sci. USA 103, 8577-8582 (2006),
        :doi:`10.1073/pnas.0601602103`, :arxiv:`physics/0602124`
+    .. [blondel-fast-2008] Vincent D. Blondel, Jean-Loup Guillaume, Renaud
+       Lambiotte and Etienne Lefebvre, "Fast unfolding of communities in large
+       networks", J. Stat. Mech. P10008 (2008),
+       :doi:`10.1088/1742-5468/2008/10/P10008`, :arxiv:`0803.0476`
     .. _simulated annealing: http://en.wikipedia.org/wiki/Simulated_annealing
     """
 
-    if spins == None:
+    if libgraph_tool_community is None and (method != "louvain" or
+                                            n_replicas > 1):
+        raise ImportError("libgraph_tool_community module not available, " +
+                          "only single runs of method 'louvain' are supported")
+
+    if n_replicas > 1:
+        if spins is None:
+            replicas = [g.new_vertex_property("int32_t")
+                        for i in xrange(n_replicas)]
+        else:
+            replicas = [g.new_vertex_property(spins.value_type())
+                        for i in xrange(n_replicas)]
+
+        def run_replica(i):
+            if history_file is None:
+                hfile = None
+            else:
+                hfile = "%s.%d" % (history_file, i)
+            community_structure(g, n_iter, n_spins, gamma, corr, replicas[i],
+                                weight, t_range, verbose, hfile, method,
+                                patience=patience, eval_every=eval_every,
+                                n_threads=n_threads)
+
+        pool = ThreadPool(n_jobs)
+        try:
+            pool.map(run_replica, range(n_replicas))
+        finally:
+            pool.close()
+            pool.join()
+
+        best = max(replicas, key=ModularityContext(g, weight).Q)
+        if spins is None:
+            spins = best
+        else:
+            g.copy_property(best, spins)
+        return spins.a if as_array else spins
+
+    if spins is None:
         spins = g.new_vertex_property("int32_t")
         new_spins = True
     else:
         new_spins = False
-    if history_file == None:
+    if history_file is None:
         history_file = ""
-    seed = random.randint(0, sys.maxint)
-    ug = GraphView(g, directed=False)
-    libgraph_tool_community.community_structure(ug._Graph__graph, gamma, corr,
-                                                n_iter, t_range[1], t_range[0],
-                                                n_spins, new_spins, seed,
-                                                verbose, history_file,
-                                                _prop("e", ug, weight),
-                                                _prop("v", ug, spins))
-    return spins
+    seed = struct.unpack("<Q", os.urandom(8))[0] & 0x7fffffffffffffff
+    if g.is_directed():
+        ug = GraphView(g, directed=False)
+    else:
+        ug = g
+    if method == "louvain":
+        if libgraph_tool_community is None:
+            _louvain.louvain(ug, gamma, corr, n_iter, seed, verbose, weight,
+                             spins)
+        else:
+            libgraph_tool_community.louvain(ug._Graph__graph, gamma, corr,
+                                            n_iter, seed, verbose,
+                                            _prop("e", ug, weight),
+                                            _prop("v", ug, spins))
+        return spins.a if as_array else spins
+    elif method != "annealing":
+        raise ValueError("invalid method: " + str(method))
+    if patience is None:
+        patience = 0
+    if n_threads is not None:
+        old_n_threads = libcore.openmp_get_num_threads()
+        libcore.openmp_set_num_threads(n_threads)
+    try:
+        libgraph_tool_community.community_structure(ug._Graph__graph, gamma,
+                                                    corr, n_iter, t_range[1],
+                                                    t_range[0], n_spins,
+                                                    new_spins, seed, verbose,
+                                                    history_file,
+                                                    _prop("e", ug, weight),
+                                                    _prop("v", ug, spins),
+                                                    patience, eval_every)
+    finally:
+        if n_threads is not None:
+            libcore.openmp_set_num_threads(old_n_threads)
+    return spins.a if as_array else spins
 
 
 def modularity(g, prop, weight=None):
@@ -225,8 +381,9 @@ def modularity(g, prop, weight=None):
     ----------
     g : :class:`~graph_tool.Graph`
         Graph to be used.
-    prop : :class:`~graph_tool.PropertyMap`
-        Vertex property map with the community partition.
+    prop : :class:`~graph_tool.PropertyMap` or :class:`~numpy.ndarray`
+        Vertex property map with the community partition, or an integer array
+        with the partition values, indexed by vertex index.
     weight : :class:`~graph_tool.PropertyMap` (optional, default: None)
         Edge property map with the optional edge weights.
 
@@ -239,6 +396,7 @@ def modularity(g, prop, weight=None):
     --------
     community_structure: obtain the community structure
     modularity: calculate the network modularity
+    ModularityContext: repeated modularity evaluations
     condensation_graph: network of communities
 
     Notes
@@ -273,11 +431,123 @@ def modularity(g, prop, weight=None):
        :doi:`10.1073/pnas.0601602103`, :arxiv:`physics/0602124`
     """
 
-    ug = GraphView(g, directed=False)
-    m = libgraph_tool_community.modularity(ug._Graph__graph,
-                                           _prop("e", ug, weight),
-                                           _prop("v", ug, prop))
-    return m
+    # directed graphs are handled directly by the C++ code, which ignores the
+    # edge directions
+    if weight is None:
+        weight = libcore.any()
+    else:
+        weight = _prop("e", g, weight)
+    return libgraph_tool_community.modularity(g._Graph__graph, weight,
+                                              _vprop(g, prop))
+
+
+class ModularityContext(object):
+    r"""
+    Precomputed information for the evaluation of Newman's modularity of many
+    different partitions of the same graph.
+
+    Parameters
+    ----------
+    g : :class:`~graph_tool.Graph`
+        Graph to be used.
+    weight : :class:`~graph_tool.PropertyMap` (optional, default: None)
+        Edge property map with the optional edge weights.
+
+    Notes
+    -----
+    The vertex degrees, number of edges and total edge weight are computed only
+    once, when the context is created, and are reused by every call to
+    :meth:`Q`. The context becomes invalid if the graph, or the edge weights,
+    are modified afterwards.
+
+    Examples
+    --------
+    >>> from numpy.random import seed
+    >>> seed(42)
+    >>> g = gt.load_graph("community.xml")
+    >>> ctx = gt.ModularityContext(g)
+    >>> spins = gt.community_structure(g, 10000, 10)
+    >>> print abs(ctx.Q(spins) - gt.modularity(g, spins)) < 1e-12
+    True
+    """
+
+    def __init__(self, g, weight=None):
+        if g.is_directed():
+            g = GraphView(g, directed=False)
+        self.g = g
+        self.weight = weight
+        self.__graph = g._Graph__graph
+        self.__weight = _prop("e", g, weight)
+        self.__modularity = libgraph_tool_community.modularity_cached
+        self.k, self.E, self.W = \
+            libgraph_tool_community.modularity_degrees(self.__graph,
+                                                       self.__weight)
+
+    def Q(self, prop):
+        """Return Newman's modularity of the partition given by the vertex
+        property map `prop`. See :func:`modularity` for details."""
+        return self.__modularity(self.__graph, self.__weight,
+                                 _vprop(self.g, prop), self.k, self.E, self.W)
+
+
+def modularity_batch(g, props, weight=None):
+    r"""
+    Calculate Newman's modularity of several partitions of the same graph.
+
+    Parameters
+    ----------
+    g : :class:`~graph_tool.Graph`
+        Graph to be used.
+    props : list of :class:`~graph_tool.PropertyMap` or :class:`~numpy.ndarray`
+        List of vertex property maps (or arrays indexed by vertex index) with
+        the community partitions, or a two-dimensional array of shape
+        ``(N, K)``, where each of the ``K`` columns is a partition.
+    weight : :class:`~graph_tool.PropertyMap` (optional, default: None)
+        Edge property map with the optional edge weights.
+
+    Returns
+    -------
+    modularity : :class:`~numpy.ndarray`
+        Newman's modularity of each partition.
+
+    See Also
+    --------
+    modularity: calculate the network modularity
+
+    Notes
+    -----
+    This is equivalent to calling :func:`modularity` for each partition, but
+    the edges of the graph are traversed only once.
+
+    Examples
+    --------
+    >>> from numpy.random import seed
+    >>> seed(42)
+    >>> g = gt.load_graph("community.xml")
+    >>> spins = [gt.community_structure(g, 1000, 10) for i in range(3)]
+    >>> q = gt.modularity_batch(g, spins)
+    >>> print abs(q - [gt.modularity(g, s) for s in spins]).max() < 1e-10
+    True
+    >>> from numpy import column_stack
+    >>> q2 = gt.modularity_batch(g, column_stack([s.a for s in spins]))
+    >>> print abs(q2 - q).max() < 1e-10
+    True
+    """
+
+    if g.is_directed():
+        g = GraphView(g, directed=False)
+    if isinstance(props, numpy.ndarray):
+        partitions = props
+    else:
+        partitions = numpy.column_stack([p.a if isinstance(p, PropertyMap)
+                                         else p for p in props])
+    partitions = numpy.ascontiguousarray(partitions, dtype="int64")
+    if weight is None:
+        weight = libcore.any()
+    else:
+        weight = _prop("e", g, weight)
+    return libgraph_tool_community.modularity_batch(g._Graph__graph, weight,
+                                                    partitions)
 
 
 def condensation_graph(g, prop, weight=None):
@@ -304,6 +574,8 @@ def condensation_graph(g, prop, weight=None):
         A vertex property map with the vertex count for each community.
     ecount : :class:`~graph_tool.PropertyMap`
         An edge property map with the inter-community edge count for each edge.
+        If `weight` is given, this is the sum of the weights instead, with the
+        same value type as `weight` if it is an integer type.
 
     See Also
     --------
@@ -341,8 +613,13 @@ def condensation_graph(g, prop, weight=None):
     """
     gp = Graph(directed=g.is_directed())
     vcount = gp.new_vertex_property("int32_t")
-    if weight != None:
+    # the edge counts are integers, unless the weights are floating point
+    if weight is None:
+        ecount = gp.new_edge_property("int32_t")
+    elif weight.value_type() in ["double", "long double"]:
         ecount = gp.new_edge_property("double")
+    elif weight.value_type() == "int64_t":
+        ecount = gp.new_edge_property("int64_t")
     else:
         ecount = gp.new_edge_property("int32_t")
     cprop = gp.new_vertex_property(prop.value_type())
@@ -0,0 +1,213 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# graph_tool -- a general graph manipulation python module
+#
+# Copyright (C) 2007-2011 Tiago de Paula Peixoto <tiago@skewed.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Python implementation of the Louvain method, which is used by
+:func:`~graph_tool.community.community_structure` if the compiled
+``libgraph_tool_community`` module is not available. It mirrors the C++
+implementation in ``graph_community_louvain.hh``. If numba is installed, each
+sweep of local moves is just-in-time compiled, otherwise it runs as plain
+Python. Only the core library is required; ``libgraph_tool_topology`` is used
+to read the edges faster, if it is available.
+"""
+
+import sys
+import numpy
+
+try:
+    from numba import njit
+except ImportError:
+    def njit(**kwargs):
+        return lambda f: f
+
+__all__ = ["louvain"]
+
+
+@njit(cache=True)
+def _sweep(row, nbr, w, a, f, gamma, order, comm, tot, neigh_w, touched,
+           is_touched):
+    """Move each node, in the given order, to the neighbouring community with
+    the largest gain. The arrays `comm` and `tot` are updated in place, and the
+    number of moves is returned. The neighbouring communities are marked in
+    `is_touched`, since their weights may be zero."""
+    moves = 0
+    for oi in range(len(order)):
+        i = order[oi]
+        c_old = comm[i]
+        n_touched = 0
+        for j in range(row[i], row[i + 1]):
+            c = comm[nbr[j]]
+            if not is_touched[c]:
+                is_touched[c] = True
+                touched[n_touched] = c
+                n_touched += 1
+            neigh_w[c] += w[j]
+
+        tot[c_old] -= a[i]
+        best = c_old
+        best_gain = neigh_w[c_old] - gamma * f * a[i] * tot[c_old]
+        for l in range(n_touched):
+            c = touched[l]
+            gain = neigh_w[c] - gamma * f * a[i] * tot[c]
+            if gain > best_gain:
+                best_gain = gain
+                best = c
+        tot[best] += a[i]
+        if best != c_old:
+            comm[i] = best
+            moves += 1
+
+        for l in range(n_touched):
+            neigh_w[touched[l]] = 0
+            is_touched[touched[l]] = False
+    return moves
+
+
+def _local_moves(row, nbr, w, a, f, gamma, rs, max_iter):
+    """Perform sweeps of local moves, with the node order reshuffled before
+    each one, until no more moves are made, or `max_iter` sweeps are done (if
+    nonzero). Returns the community of each node and the number of moves."""
+    N = len(a)
+    comm = numpy.arange(N)
+    tot = a.copy()
+    neigh_w = numpy.zeros(N)
+    touched = numpy.zeros(N, dtype="int64")
+    is_touched = numpy.zeros(N, dtype="bool")
+    order = numpy.arange(N)
+    total_moves = 0
+    it = 0
+    while max_iter == 0 or it < max_iter:
+        rs.shuffle(order)
+        moves = _sweep(row, nbr, w, a, f, gamma, order, comm, tot, neigh_w,
+                       touched, is_touched)
+        total_moves += moves
+        it += 1
+        if moves == 0:
+            break
+    return comm, total_moves
+
+
+def _contract(row, nbr, w, self_w, k, size, comm, C):
+    """Contract the communities `comm` (in the range [0, C-1]) into the nodes
+    of a new network."""
+    src = numpy.repeat(numpy.arange(len(k)), numpy.diff(row))
+    cs = comm[src]
+    ct = comm[nbr]
+    inside = cs == ct
+
+    c_self_w = (numpy.bincount(comm, weights=self_w, minlength=C) +
+                numpy.bincount(cs[inside], weights=w[inside], minlength=C))
+    c_k = numpy.bincount(comm, weights=k, minlength=C)
+    c_size = numpy.bincount(comm, weights=size, minlength=C)
+
+    outside = numpy.logical_not(inside)
+    key = cs[outside] * C + ct[outside]
+    ukey, inv = numpy.unique(key, return_inverse=True)
+    c_w = numpy.bincount(inv, weights=w[outside], minlength=len(ukey))
+    c_nbr = ukey % C
+    c_row = numpy.zeros(C + 1, dtype="int64")
+    c_row[1:] = numpy.cumsum(numpy.bincount(ukey // C, minlength=C))
+    return c_row, c_nbr, c_w, c_self_w, c_k, c_size
+
+
+def _edge_arrays(g):
+    """Return the source and target vertex indexes, and the edge indexes, of
+    the edges of the graph. The arrays are obtained in a single call from
+    ``libgraph_tool_topology`` if it is available. Otherwise the edges are
+    iterated over in Python, so that this module depends only on the core
+    library."""
+    try:
+        from ..topology import _edges_soa
+    except ImportError:
+        edges = numpy.array([(int(e.source()), int(e.target()),
+                              g.edge_index[e]) for e in g.edges()],
+                            dtype="int64").reshape((-1, 3))
+        return edges[:, 0], edges[:, 1], edges[:, 2]
+    return _edges_soa(g)
+
+
+def _graph_csr(g, weight):
+    """Return the CSR representation of the graph, ignoring self-loops, and a
+    boolean array marking the valid vertex indexes."""
+    s, t, eidx = _edge_arrays(g)
+    vfilt, inverted = g.get_vertex_filter()
+    if vfilt is None:
+        valid = numpy.ones(g.num_vertices(), dtype="bool")
+    else:
+        valid = vfilt.a == (not inverted)
+    N = len(valid)
+
+    if weight is None:
+        ws = numpy.ones(len(eidx))
+    else:
+        ws = numpy.asarray(weight.a, dtype="float64")[eidx]
+    loop = s == t
+    s, t, ws = s[~loop], t[~loop], ws[~loop]
+    src = numpy.concatenate((s, t))
+    idx = numpy.argsort(src, kind="mergesort")
+    nbr = numpy.concatenate((t, s))[idx]
+    w = numpy.concatenate((ws, ws))[idx]
+    row = numpy.zeros(N + 1, dtype="int64")
+    row[1:] = numpy.cumsum(numpy.bincount(src, minlength=N))
+    return row, nbr, w, valid
+
+
+def louvain(g, gamma, corr, max_iter, seed, verbose, weight, spins):
+    """Store in `spins` the communities found by the Louvain method, as done by
+    the ``louvain()`` function of ``libgraph_tool_community``. The graph `g`
+    must be undirected."""
+    if corr not in ["erdos", "uncorrelated"]:
+        raise ValueError("invalid correlation type for the louvain method: " +
+                         str(corr))
+
+    row, nbr, w, valid = _graph_csr(g, weight)
+    N = len(valid)
+    k = numpy.bincount(numpy.repeat(numpy.arange(N), numpy.diff(row)),
+                       weights=w, minlength=N)
+    W = w.sum()
+    comm = numpy.arange(N)
+
+    if W > 0:
+        NV = valid.sum()
+        if corr == "erdos":
+            f = W / float(NV * NV)
+        else:
+            f = 1. / W
+        self_w = numpy.zeros(N)
+        size = valid.astype("float64")
+        rs = numpy.random.RandomState(seed % 2 ** 32)
+        level = 0
+        while True:
+            a = size if corr == "erdos" else k
+            c, moves = _local_moves(row, nbr, w, a, f, gamma, rs, max_iter)
+            c = numpy.unique(c, return_inverse=True)[1]
+            C = c.max() + 1
+            if verbose:
+                sys.stdout.write("level %d: %d moves, %d communities\n" %
+                                 (level, moves, C))
+            comm = c[comm]
+            if moves == 0 or C == len(k):
+                break
+            row, nbr, w, self_w, k, size = _contract(row, nbr, w, self_w, k,
+                                                     size, c, C)
+            level += 1
+
+    labels = numpy.unique(comm[valid], return_inverse=True)[1]
+    spins.a[numpy.where(valid)[0]] = labels
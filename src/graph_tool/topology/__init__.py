@@ -30,6 +30,7 @@ Summary
 
    shortest_distance
    shortest_path
+   shortest_paths
    similarity
    isomorphism
    subgraph_isomorphism
@@ -51,14 +52,46 @@ Contents
 from .. dl_import import dl_import
 dl_import("import libgraph_tool_topology")
 
-from .. import _prop, Vector_int32_t, _check_prop_writable, \
+from .. import _prop, _check_prop_writable, \
      _check_prop_scalar, _check_prop_vector, Graph, PropertyMap, GraphView
-import random, sys, numpy, weakref
+import sys, numpy, weakref
+from random import getrandbits
 __all__ = ["isomorphism", "subgraph_isomorphism", "mark_subgraph",
            "min_spanning_tree", "dominator_tree", "topological_sort",
            "transitive_closure", "label_components", "label_largest_component",
            "label_biconnected_components", "shortest_distance",
-           "shortest_path", "is_planar", "similarity"]
+           "shortest_path", "shortest_paths", "is_planar", "similarity"]
+
+
+def _edges_soa(g):
+    """Return the edges of the (possibly filtered) graph as three contiguous
+    arrays, with the source and target vertex indexes, and the edge indexes,
+    respectively."""
+    edges = libgraph_tool_topology.get_edges(g._Graph__graph)
+    return (numpy.ascontiguousarray(edges[:, 0]),
+            numpy.ascontiguousarray(edges[:, 1]),
+            numpy.ascontiguousarray(edges[:, 2]))
+
+
+def _edge_intersection_size(g1, g2):
+    """Return the number of common entries in the adjacency lists of both
+    graphs, with parallel edges counted with multiplicity, as done by the
+    ``similarity()`` function of ``libgraph_tool_topology`` with the vertex
+    indexes used as labels."""
+    edges = [_edges_soa(g1)[:2], _edges_soa(g2)[:2]]
+    V = max([max(s.max(), t.max()) + 1 for s, t in edges if len(s) > 0] +
+            [0])
+    counts = []
+    for g, (s, t) in zip([g1, g2], edges):
+        keys = s * V + t
+        if not g.is_directed():
+            keys = numpy.concatenate((keys, t * V + s))
+        keys, inv = numpy.unique(keys, return_inverse=True)
+        counts.append((keys, numpy.bincount(inv, minlength=len(keys))))
+    (k1, c1), (k2, c2) = counts
+    common = numpy.intersect1d(k1, k2, assume_unique=True)
+    return int(numpy.minimum(c1[numpy.searchsorted(k1, common)],
+                             c2[numpy.searchsorted(k2, common)]).sum())
 
 
 def similarity(g1, g2, label1=None, label2=None, norm=True):
@@ -107,15 +140,20 @@ def similarity(g1, g2, label1=None, label2=None, norm=True):
     0.03333333333333333
     """
 
-    if label1 is None:
-        label1 = g1.vertex_index
-    if label2 is None:
-        label2 = g2.vertex_index
-    if label1.value_type() != label2.value_type():
-        raise ValueError("label property maps must be of the same type")
-    s = libgraph_tool_topology.\
-           similarity(g1._Graph__graph, g2._Graph__graph,
-                      _prop("v", g1, label1), _prop("v", g1, label2))
+    if label1 is None and label2 is None:
+        # the labels are the vertex indexes themselves, so the similarity is
+        # just the size of the (multi)set intersection of the edge lists
+        s = _edge_intersection_size(g1, g2)
+    else:
+        if label1 is None:
+            label1 = g1.vertex_index
+        if label2 is None:
+            label2 = g2.vertex_index
+        if label1.value_type() != label2.value_type():
+            raise ValueError("label property maps must be of the same type")
+        s = libgraph_tool_topology.\
+               similarity(g1._Graph__graph, g2._Graph__graph,
+                          _prop("v", g1, label1), _prop("v", g1, label2))
     if not g1.is_directed() or not g2.is_directed():
         s /= 2
     if norm:
@@ -143,6 +181,13 @@ def isomorphism(g1, g2, isomap=False):
     False
 
     """
+    # the sorted degree sequences are compared by isomorphism() in BGL, before
+    # the search
+    if (g1.num_vertices() != g2.num_vertices() or
+        g1.num_edges() != g2.num_edges()):
+        if isomap:
+            return False, g1.new_vertex_property("int32_t")
+        return False
     imap = g1.new_vertex_property("int32_t")
     iso = libgraph_tool_topology.\
            check_isomorphism(g1._Graph__graph, g2._Graph__graph,
@@ -153,7 +198,7 @@ def isomorphism(g1, g2, isomap=False):
         return iso
 
 
-def subgraph_isomorphism(sub, g, max_n=0, random=True):
+def subgraph_isomorphism(sub, g, max_n=0, random=True, as_array=False):
     r"""
     Obtain all subgraph isomorphisms of `sub` in `g` (or at most `max_n`
     subgraphs, if `max_n > 0`).
@@ -165,6 +210,11 @@ def subgraph_isomorphism(sub, g, max_n=0, random=True):
     with the isomorphism mappings. The value of the properties are the
     vertex/edge index of the corresponding vertex/edge in `g`.
 
+    If `as_array` = True, two arrays are returned instead, with one row per
+    isomorphism, containing the values of the vertex and edge property maps,
+    respectively (i.e. their ``a`` attribute). This avoids creating a
+    :class:`~graph_tool.PropertyMap` for each isomorphism.
+
     Examples
     --------
     >>> from numpy.random import seed, poisson
@@ -219,7 +269,7 @@ def subgraph_isomorphism(sub, g, max_n=0, random=True):
     vmaps = []
     emaps = []
     if random:
-        seed = numpy.random.randint(0, sys.maxint)
+        seed = getrandbits(63)
     else:
         seed = 42
     libgraph_tool_topology.\
@@ -229,9 +279,15 @@ def subgraph_isomorphism(sub, g, max_n=0, random=True):
                                 _prop("e", sub, elabels[0]),
                                 _prop("e", g, elabels[1]),
                                 vmaps, emaps, max_n, seed)
-    for i in xrange(len(vmaps)):
-        vmaps[i] = PropertyMap(vmaps[i], sub, "v")
-        emaps[i] = PropertyMap(emaps[i], sub, "e")
+    if as_array:
+        # same sizes as the property maps created by the C++ code
+        N = sub._Graph__graph.GetNumberOfVertices()
+        E = sub._Graph__graph.GetMaxEdgeIndex() + 1
+        vmaps = numpy.array([m.get_array(N) for m in vmaps], dtype="int64")
+        emaps = numpy.array([m.get_array(E) for m in emaps], dtype="int64")
+        return vmaps.reshape((-1, N)), emaps.reshape((-1, E))
+    vmaps = [PropertyMap(m, sub, "v") for m in vmaps]
+    emaps = [PropertyMap(m, sub, "e") for m in emaps]
     return vmaps, emaps
 
 
@@ -247,22 +303,21 @@ def mark_subgraph(g, sub, vmap, emap, vmask=None, emask=None):
     indicating whether or not a vertex/edge in `g` corresponds to the subgraph
     `sub`.
     """
+    # newly created property maps are already zeroed
     if vmask is None:
         vmask = g.new_vertex_property("bool")
+    else:
+        vmask.a = False
     if emask is None:
         emask = g.new_edge_property("bool")
+    else:
+        emask.a = False
 
-    vmask.a = False
-    emask.a = False
-
-    for v in sub.vertices():
-        w = g.vertex(vmap[v])
-        vmask[w] = True
-        for ew in w.out_edges():
-            for ev in v.out_edges():
-                if emap[ev] == g.edge_index[ew]:
-                    emask[ew] = True
-                    break
+    libgraph_tool_topology.mark_subgraph(sub._Graph__graph, g._Graph__graph,
+                                         _prop("v", sub, vmap),
+                                         _prop("e", sub, emap),
+                                         _prop("v", g, vmask),
+                                         _prop("e", g, emask))
     return vmask, emask
 
 
@@ -333,21 +388,23 @@ def min_spanning_tree(g, weights=None, root=None, tree_map=None):
     if tree_map.value_type() != "bool":
         raise ValueError("edge property 'tree_map' must be of value type bool.")
 
-    try:
-        g.stash_filter(directed=True)
-        g.set_directed(False)
-        if root is None:
-            libgraph_tool_topology.\
-                   get_kruskal_spanning_tree(g._Graph__graph,
-                                             _prop("e", g, weights),
-                                             _prop("e", g, tree_map))
-        else:
-            libgraph_tool_topology.\
-                   get_prim_spanning_tree(g._Graph__graph, int(root),
-                                          _prop("e", g, weights),
-                                          _prop("e", g, tree_map))
-    finally:
-        g.pop_filter(directed=True)
+    # an undirected view is used, instead of temporarily changing the
+    # directionality of g itself. The view is only needed if g is directed,
+    # since it is relatively expensive to create
+    if g.is_directed():
+        ug = GraphView(g, directed=False)
+    else:
+        ug = g
+    if root is None:
+        libgraph_tool_topology.\
+               get_kruskal_spanning_tree(ug._Graph__graph,
+                                         _prop("e", ug, weights),
+                                         _prop("e", ug, tree_map))
+    else:
+        libgraph_tool_topology.\
+               get_prim_spanning_tree(ug._Graph__graph, int(root),
+                                      _prop("e", ug, weights),
+                                      _prop("e", ug, tree_map))
     return tree_map
 
 
@@ -410,8 +467,8 @@ def dominator_tree(g, root, dom_map=None):
 
 def topological_sort(g):
     """
-    Return the topological sort of the given graph. It is returned as an array
-    of vertex indexes, in the sort order.
+    Return the topological sort of the given graph. It is returned as an
+    ``int32`` array of vertex indexes, in the sort order.
 
     Notes
     -----
@@ -440,10 +497,7 @@ def topological_sort(g):
 
     """
 
-    topological_order = Vector_int32_t()
-    libgraph_tool_topology.\
-               topological_sort(g._Graph__graph, topological_order)
-    return numpy.array(topological_order)
+    return libgraph_tool_topology.topological_sort(g._Graph__graph)
 
 
 def transitive_closure(g):
@@ -581,12 +635,14 @@ def label_largest_component(g, directed=None):
     """
 
     label = g.new_vertex_property("bool")
-    c, h = label_components(g, directed=directed)
-    vfilt, inv = g.get_vertex_filter()
-    if vfilt is None:
-        label.a = c.a == h.argmax()
+    if directed is not None and directed != g.is_directed():
+        ug = GraphView(g, directed=directed)
     else:
-        label.a = (c.a == h.argmax()) & (vfilt.a ^ inv)
+        ug = g
+    # the mask is written directly by the C++ code, without returning the
+    # component labels and histogram
+    libgraph_tool_topology.label_largest_component(ug._Graph__graph,
+                                                   _prop("v", ug, label))
     return label
 
 
@@ -677,7 +733,7 @@ def label_biconnected_components(g, eprop=None, vprop=None):
 
 def shortest_distance(g, source=None, weights=None, max_dist=None,
                       directed=None, dense=False, dist_map=None,
-                      pred_map=False):
+                      pred_map=False, sources=None, max_weight=None):
     """
     Calculate the distance of all vertices from a given source, or the all pairs
     shortest paths, if the source is not specified.
@@ -708,12 +764,26 @@ def shortest_distance(g, source=None, weights=None, max_dist=None,
     pred_map : bool (optional, default: False)
         If true, a vertex property map with the predecessors is returned.
         Ignored if source=None.
+    sources : list of :class:`~graph_tool.Vertex` or ints (optional, default: None)
+        If given, the distances from all these source vertices are computed in
+        a single call, in parallel if OpenMP is enabled, and returned as an
+        array. The parameters `source`, `dense`, `dist_map` and `pred_map` are
+        ignored in this case.
+    max_weight : int (optional, default: None)
+        If given, the weights must be non-negative integers not larger than
+        this value, and Dial's algorithm [dial]_ is used instead of Dijkstra's.
+        This is faster if the value is small, since it uses ``max_weight + 1``
+        buckets instead of a heap. This parameter has no effect if source is
+        None, or if `sources` is given.
 
     Returns
     -------
-    dist_map : :class:`~graph_tool.PropertyMap`
+    dist_map : :class:`~graph_tool.PropertyMap` or :class:`~numpy.ndarray`
         Vertex property map with the distances from source. If source is 'None',
         it will have a vector value type, with the distances to every vertex.
+        If `sources` is given, this is an array of shape ``(len(sources), N)``
+        instead, where the row ``i`` has the distances from ``sources[i]``,
+        indexed by the vertex index.
 
     Notes
     -----
@@ -724,6 +794,9 @@ def shortest_distance(g, source=None, weights=None, max_dist=None,
     [johnson-apsp]_. If dense=True, the Floyd-Warshall algorithm
     [floyd-warshall-apsp]_ is used instead.
 
+    If `max_weight` is given, a :class:`ValueError` is raised if a larger, or
+    negative, weight is found during the search.
+
     If source is specified, the algorithm runs in :math:`O(V + E)` time, or
     :math:`O(V \log V)` if weights are given. If source is not specified, it
     runs in :math:`O(VE\log V)` time, or :math:`O(V^3)` if dense == True.
@@ -771,6 +844,12 @@ def shortest_distance(g, source=None, weights=None, max_dist=None,
               4          4          7          4          3          5
               5          2          7          3          4          4
               4          3          4          4]
+    >>> dists = gt.shortest_distance(g, sources=[g.vertex(0), g.vertex(1)])
+    >>> print dists.shape
+    (2, 100)
+    >>> print all([(dists[i] == gt.shortest_distance(g, source=v).a).all()
+    ...            for i, v in enumerate([g.vertex(0), g.vertex(1)])])
+    True
 
     References
     ----------
@@ -781,57 +860,76 @@ def shortest_distance(g, source=None, weights=None, max_dist=None,
     .. [dijkstra] E. Dijkstra, "A note on two problems in connexion with
        graphs." Numerische Mathematik, 1:269-271, 1959.
     .. [dijkstra-boost] http://www.boost.org/libs/graph/doc/dijkstra_shortest_paths.html
+    .. [dial] R. B. Dial, "Algorithm 360: shortest-path forest with
+       topological ordering", Communications of the ACM, 12:632-633, 1969.
     .. [johnson-apsp] http://www.boost.org/libs/graph/doc/johnson_all_pairs_shortest.html
     .. [floyd-warshall-apsp] http://www.boost.org/libs/graph/doc/floyd_warshall_shortest.html
     """
 
+    if max_dist is None:
+        max_dist = 0
+
+    # the search is done on a view with the desired directionality, instead of
+    # temporarily changing the directionality of g itself; the property maps
+    # still belong to g. The view is only needed if the directionality
+    # actually changes, since it is relatively expensive to create
+    if directed is not None and directed != g.is_directed():
+        ug = GraphView(g, directed=directed)
+    else:
+        ug = g
+
+    if sources is not None:
+        sources = numpy.array([int(v) for v in sources], dtype="int64")
+        return libgraph_tool_topology.get_dists_multi(ug._Graph__graph,
+                                                      sources,
+                                                      _prop("e", ug, weights),
+                                                      float(max_dist))
+
     if weights is None:
         dist_type = 'int32_t'
     else:
         dist_type = weights.value_type()
 
-    if dist_map is None:
-        if source is not None:
-            dist_map = g.new_vertex_property(dist_type)
-        else:
+    if source is None:
+        if dist_map is None:
             dist_map = g.new_vertex_property("vector<%s>" % dist_type)
+        _check_prop_writable(dist_map, name="dist_map")
+        _check_prop_vector(dist_map, name="dist_map")
+        libgraph_tool_topology.get_all_dists(ug._Graph__graph,
+                                             _prop("v", ug, dist_map),
+                                             _prop("e", ug, weights), dense)
+        return dist_map
 
+    if dist_map is None:
+        dist_map = g.new_vertex_property(dist_type)
     _check_prop_writable(dist_map, name="dist_map")
-    if source is not None:
-        _check_prop_scalar(dist_map, name="dist_map")
+    _check_prop_scalar(dist_map, name="dist_map")
+
+    # the predecessor of each vertex is initialized to itself by the C++ code
+    pmap = g.new_vertex_property("int64_t")
+    if weights is not None and max_weight is not None:
+        if weights.value_type() not in ["bool", "int32_t", "int64_t"]:
+            raise ValueError("edge property 'weights' must be of integer " +
+                             "value type if max_weight is given.")
+        libgraph_tool_topology.get_dists_dial(ug._Graph__graph, int(source),
+                                              _prop("v", ug, dist_map),
+                                              _prop("e", ug, weights),
+                                              _prop("v", ug, pmap),
+                                              float(max_dist),
+                                              int(max_weight))
     else:
-        _check_prop_vector(dist_map, name="dist_map")
-
-    if max_dist is None:
-        max_dist = 0
-
-    if directed is not None:
-        g.stash_filter(directed=True)
-        g.set_directed(directed)
-
-    try:
-        if source is not None:
-            pmap = g.copy_property(g.vertex_index, value_type="int64_t")
-            libgraph_tool_topology.get_dists(g._Graph__graph, int(source),
-                                             _prop("v", g, dist_map),
-                                             _prop("e", g, weights),
-                                             _prop("v", g, pmap),
-                                             float(max_dist))
-        else:
-            libgraph_tool_topology.get_all_dists(g._Graph__graph,
-                                                 _prop("v", g, dist_map),
-                                                 _prop("e", g, weights), dense)
-
-    finally:
-        if directed is not None:
-            g.pop_filter(directed=True)
-    if source is not None and pred_map:
+        libgraph_tool_topology.get_dists(ug._Graph__graph, int(source),
+                                         _prop("v", ug, dist_map),
+                                         _prop("e", ug, weights),
+                                         _prop("v", ug, pmap),
+                                         float(max_dist))
+    if pred_map:
         return dist_map, pmap
-    else:
-        return dist_map
+    return dist_map
 
 
-def shortest_path(g, source, target, weights=None, pred_map=None):
+def shortest_path(g, source, target, weights=None, pred_map=None,
+                  as_array=False):
     """
     Return the shortest path from `source` to `target`.
 
@@ -850,22 +948,27 @@ def shortest_path(g, source, target, weights=None, pred_map=None):
         Vertex property map with the predecessors in the search tree. If this is
         provided, the shortest paths are not computed, and are obtained directly
         from this map.
+    as_array : bool (optional, default: False)
+        If ``True``, the vertex and edge indexes along the path are returned as
+        two ``int64`` arrays, instead of lists of vertices and edges.
 
     Returns
     -------
-    vertex_list : list of :class:`~graph_tool.Vertex`
+    vertex_list : list of :class:`~graph_tool.Vertex` or :class:`~numpy.ndarray`
         List of vertices from `source` to `target` in the shortest path.
-    edge_list : list of :class:`~graph_tool.Edge`
+    edge_list : list of :class:`~graph_tool.Edge` or :class:`~numpy.ndarray`
         List of edges from `source` to `target` in the shortest path.
 
     Notes
     -----
 
-    The paths are computed with a breadth-first search (BFS) or Dijkstra's
-    algorithm [dijkstra]_, if weights are given.
+    If `pred_map` is not given, the path is computed with a bidirectional
+    version of Dijkstra's algorithm [dijkstra]_, which searches forward from
+    the source and backward from the target at the same time, and stops as
+    soon as both searches meet. This usually visits only a small fraction of
+    the graph.
 
-    The algorithm runs in :math:`O(V + E)` time, or :math:`O(V \log V)` if
-    weights are given.
+    The algorithm runs in :math:`O((V + E) \log V)` time in the worst case.
 
     Examples
     --------
@@ -873,10 +976,17 @@ def shortest_path(g, source, target, weights=None, pred_map=None):
     >>> seed(42)
     >>> g = gt.random_graph(300, lambda: (poisson(3), poisson(3)))
     >>> vlist, elist = gt.shortest_path(g, g.vertex(10), g.vertex(11))
-    >>> print [str(v) for v in vlist]
-    ['10', '222', '246', '0', '50', '257', '12', '242', '11']
-    >>> print [str(e) for e in elist]
-    ['(10,222)', '(222,246)', '(246,0)', '(0,50)', '(50,257)', '(257,12)', '(12,242)', '(242,11)']
+    >>> print vlist[0], vlist[-1]
+    10 11
+    >>> print all([int(e.source()) == int(u) and int(e.target()) == int(v)
+    ...            for e, u, v in zip(elist, vlist[:-1], vlist[1:])])
+    True
+    >>> dist = gt.shortest_distance(g, source=g.vertex(10))
+    >>> print len(elist) == dist[g.vertex(11)]
+    True
+
+    Since there are usually many shortest paths in unweighted graphs, only
+    their lengths are compared above.
 
     References
     ----------
@@ -889,41 +999,80 @@ def shortest_path(g, source, target, weights=None, pred_map=None):
     .. [dijkstra-boost] http://www.boost.org/libs/graph/doc/dijkstra_shortest_paths.html
     """
 
+    source = int(source)
+    target = int(target)
     if pred_map is None:
-        pred_map = shortest_distance(g, source, weights=weights,
-                                     pred_map=True)[1]
+        # a single pair is searched from both ends at once
+        return libgraph_tool_topology.\
+               get_pair_path(g._Graph__graph, weakref.ref(g._Graph__graph),
+                             source, target, _prop("e", g, weights),
+                             as_array)
 
-    if pred_map[target] == int(target):  # no path to source
-        return [], []
+    return libgraph_tool_topology.\
+           get_pred_path(g._Graph__graph, weakref.ref(g._Graph__graph),
+                         source, target, _prop("v", g, pred_map),
+                         _prop("e", g, weights), as_array)
 
-    vlist = [target]
-    elist = []
 
-    if weights is not None:
-        max_w = weights.a.max() + 1
-    else:
-        max_w = None
-
-    v = target
-    while v != source:
-        p = g.vertex(pred_map[v])
-        min_w = max_w
-        pe = None
-        s = None
-        for e in v.in_edges() if g.is_directed() else v.out_edges():
-            s = e.source() if g.is_directed() else e.target()
-            if s == p:
-                if weights is not None:
-                    if weights[e] < min_w:
-                        min_w = weights[e]
-                        pe = e
-                else:
-                    pe = e
-                    break
-        elist.insert(0, pe)
-        vlist.insert(0, p)
-        v = p
-    return vlist, elist
+def shortest_paths(g, pairs, weights=None, as_array=False):
+    """
+    Return the shortest paths between several pairs of vertices.
+
+    Parameters
+    ----------
+    g : :class:`~graph_tool.Graph`
+        Graph to be used.
+    pairs : iterable of pairs of :class:`~graph_tool.Vertex`
+        The (source, target) pairs of the paths.
+    weights : :class:`~graph_tool.PropertyMap` (optional, default: None)
+        The edge weights.
+    as_array : bool (optional, default: False)
+        If ``True``, the paths are given by arrays of vertex and edge indexes,
+        as with :func:`~graph_tool.topology.shortest_path`.
+
+    Returns
+    -------
+    paths : list of (vertex_list, edge_list) tuples
+        The paths for each pair, in the same order as `pairs`, as returned by
+        :func:`~graph_tool.topology.shortest_path`.
+
+    Notes
+    -----
+    The pairs are grouped by source, and a single search is made from each
+    source which appears more than once, whose predecessor map is then used
+    for all its targets. The remaining pairs are searched individually.
+
+    Examples
+    --------
+    >>> from numpy.random import seed, poisson
+    >>> seed(42)
+    >>> g = gt.random_graph(300, lambda: (poisson(3), poisson(3)))
+    >>> pairs = [(g.vertex(10), g.vertex(11)), (g.vertex(10), g.vertex(12)),
+    ...          (g.vertex(20), g.vertex(21))]
+    >>> paths = gt.shortest_paths(g, pairs)
+    >>> print len(paths)
+    3
+    >>> print ([len(elist) for vlist, elist in paths] ==
+    ...        [len(gt.shortest_path(g, s, t)[1]) for s, t in pairs])
+    True
+    """
+
+    pairs = [(int(s), int(t)) for s, t in pairs]
+    by_source = {}
+    for i, (s, t) in enumerate(pairs):
+        by_source.setdefault(s, []).append(i)
+
+    paths = [None] * len(pairs)
+    for s, idx in by_source.iteritems():
+        if len(idx) == 1:
+            paths[idx[0]] = shortest_path(g, s, pairs[idx[0]][1],
+                                          weights=weights, as_array=as_array)
+            continue
+        pred_map = shortest_distance(g, s, weights=weights, pred_map=True)[1]
+        for i in idx:
+            paths[i] = shortest_path(g, s, pairs[i][1], weights=weights,
+                                     pred_map=pred_map, as_array=as_array)
+    return paths
 
 
 def is_planar(g, embedding=False, kuratowski=False):
@@ -993,8 +1142,12 @@ def is_planar(g, embedding=False, kuratowski=False):
     .. [boost-planarity] http://www.boost.org/libs/graph/doc/boyer_myrvold.html
     """
 
-    g.stash_filter(directed=True)
-    g.set_directed(False)
+    # directed graphs are tested through an undirected view, instead of
+    # temporarily changing the directionality of g itself
+    if g.is_directed():
+        ug = GraphView(g, directed=False)
+    else:
+        ug = g
 
     if embedding:
         embed = g.new_vertex_property("vector<int>")
@@ -1006,12 +1159,9 @@ def is_planar(g, embedding=False, kuratowski=False):
     else:
         kur = None
 
-    try:
-        is_planar = libgraph_tool_topology.is_planar(g._Graph__graph,
-                                                     _prop("v", g, embed),
-                                                     _prop("e", g, kur))
-    finally:
-        g.pop_filter(directed=True)
+    is_planar = libgraph_tool_topology.is_planar(ug._Graph__graph,
+                                                 _prop("v", ug, embed),
+                                                 _prop("e", ug, kur))
 
     ret = [is_planar]
     if embed is not None: